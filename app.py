@@ -1,11 +1,40 @@
 import os
-print("ENV TEST →", os.getenv("GEMINI_API_KEY"))
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from google import genai
+from google.genai import types
+from pydantic import ValidationError
+import asyncio
 import json
+import logging
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from contextvars import copy_context
+
+from bank import BankRefiller, bank_from_env
+from cache import cache_from_env
+from httpcache import (
+    StaticAsset, compress, compress_response, content_etag, etag_matches,
+    json_body, negotiate, not_modified, representation_etag
+)
+from metrics import (
+    STAGE_SECONDS, begin_request, end_request, metric_store_from_env,
+    record_usage, register_collector, render, share, stage
+)
+from ratelimit import RateLimitTimeout, limiter_from_env
+from reqlog import request_log_from_env
+from resilience import (
+    DeadlineExceeded, caller_from_env, check_deadline, deadline_scope, remaining
+)
+from schema import QUESTION_COUNT, QuestionList, QuizResult
+from stream_parser import StreamingResultParser
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+log = logging.getLogger("kpss")
 
 app = Flask(__name__)
 CORS(app)
@@ -13,6 +42,66 @@ CORS(app)
 # Gemini client
 client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 
+# Konu önbelleği (CACHE_ENABLED=0 ile kapatılır)
+cache = cache_from_env()
+
+# Önceden üretilmiş soru bankası (BANK_ENABLED=0 ile kapatılır)
+bank = bank_from_env()
+
+# Açılışta sıkıştırılıp ETag'lenen statik sayfa
+INDEX = StaticAsset(
+    os.path.join(app.root_path, "index.html"),
+    "text/html",
+    max_age=int(os.getenv("STATIC_MAX_AGE", "3600"))
+)
+
+# GET /generate yanıtları için paylaşılan önbellek süresi (CDN dahil)
+GENERATE_MAX_AGE = int(os.getenv("GENERATE_MAX_AGE", "300"))
+
+# Tüm Gemini çağrılarının geçtiği, worker'lar arası ortak token bucket
+# (RATE_LIMIT_RPM=0 ile kapatılır)
+limiter = limiter_from_env()
+
+# Birincil/yedek model yönlendirmesi, hedge ve devre kesici
+caller = caller_from_env()
+
+# /generate için uçtan uca süre sınırı (saniye)
+GENERATE_DEADLINE = float(os.getenv("GENERATE_DEADLINE", "30"))
+
+# /metrics tüm worker'ların toplamını göstersin (METRICS_SHARED=0 ile kapatılır)
+share(metric_store_from_env())
+
+# Arka planda yazılan istek günlüğü (REQUEST_LOG_ENABLED=0 ile kapatılır)
+request_log = request_log_from_env()
+
+# Toplu üretim: konu başına en fazla soru, istek başına en fazla konu ve
+# aynı anda üretilen konu sayısı
+BATCH_MAX_TOPICS = int(os.getenv("BATCH_MAX_TOPICS", "20"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "20"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+# Toplu isteğin süre sınırı varsayılan olarak tur sayısından hesaplanır
+# (ceil(konu / eşzamanlılık) × GENERATE_DEADLINE); BATCH_DEADLINE verilirse
+# üst sınırdır (gunicorn --timeout'un altında kalmalı)
+BATCH_DEADLINE = float(os.getenv("BATCH_DEADLINE", "0")) or None
+
+# Şemalı üretim (STRUCTURED_OUTPUT=0 ile eski serbest metin moduna döner)
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "1") == "1"
+
+# Hangi üretim yolunun ne sıklıkla kullanıldığı
+path_counts = {
+    "clean": 0,
+    "repaired": 0,
+    "partial_regen": 0,
+    "full_retry": 0,
+    "failed": 0,
+}
+path_lock = threading.Lock()
+
+
+def count_path(path):
+    with path_lock:
+        path_counts[path] += 1
+
 
 def empty_response(topic=""):
     return {
@@ -22,6 +111,56 @@ def empty_response(topic=""):
     }
 
 
+def repair_json(raw_json):
+    # LLM kaynaklı yaygın JSON hatalarını onar
+    raw_json = re.sub(r'"\s*\n\s*"', '",\n"', raw_json)
+    raw_json = re.sub(r',\s*}', '}', raw_json)
+    raw_json = re.sub(r',\s*]', ']', raw_json)
+    return raw_json
+
+
+def validate_question(question):
+    if not isinstance(question, dict):
+        return None
+
+    choices = question.get("choices")
+    if not isinstance(choices, dict):
+        return None
+
+    choices = {k: str(choices.get(k, "")).strip() for k in "ABCD"}
+    answer = str(question.get("answer", "")).strip().upper()[:1]
+    text = str(question.get("question", "")).strip()
+
+    if not text or answer not in choices or not all(choices.values()):
+        return None
+
+    return {
+        "question": text,
+        "choices": choices,
+        "answer": answer,
+        "explanation": str(question.get("explanation", "")).strip()
+    }
+
+
+def validate_result(result, count=QUESTION_COUNT):
+    if not result or not str(result.get("story", "")).strip():
+        return False
+
+    questions = result.get("questions")
+    if not isinstance(questions, list) or len(questions) != count:
+        return False
+
+    return all(validate_question(q) is not None for q in questions)
+
+
+def parse_question(raw):
+    try:
+        return validate_question(json.loads(repair_json(raw), strict=False))
+    except Exception as e:
+        log.info("QUESTION BROKEN: %s", e)
+        return None
+
+
 def safe_json_parse(text, topic=""):
     if not text:
         return None
@@ -31,15 +170,10 @@ def safe_json_parse(text, topic=""):
 
     match = re.search(r"\{[\s\S]*\}", cleaned)
     if not match:
-        print("JSON BLOCK NOT FOUND")
+        log.info("JSON BLOCK NOT FOUND")
         return None
 
-    raw_json = match.group()
-
-    # LLM kaynaklı yaygın JSON hatalarını onar
-    raw_json = re.sub(r'"\s*\n\s*"', '",\n"', raw_json)
-    raw_json = re.sub(r',\s*}', '}', raw_json)
-    raw_json = re.sub(r',\s*]', ']', raw_json)
+    raw_json = repair_json(match.group())
 
     try:
         data = json.loads(raw_json)
@@ -54,13 +188,13 @@ def safe_json_parse(text, topic=""):
         return data
 
     except Exception as e:
-        print("JSON STILL BROKEN:", e)
-        print("RAW JSON:", raw_json)
+        log.info("JSON STILL BROKEN: %s", e)
+        log.debug("RAW JSON: %s", raw_json)
         return None
 
 
-def generate_content_from_query(user_query):
-    prompt = f"""
+def build_prompt(user_query):
+    return f"""
 SADECE JSON ÜRET.
 AÇIKLAMA YAZMA.
 KOD BLOĞU KULLANMA.
@@ -107,41 +241,904 @@ ZORUNLU KURALLAR:
 }}
 """
 
+
+def generation_config(schema, timeout=None):
+    options = {}
+
+    if STRUCTURED_OUTPUT:
+        options["response_mime_type"] = "application/json"
+        options["response_schema"] = schema
+
+    # Takılan istek kalan süreden uzun yaşamasın
+    if timeout is not None:
+        options["http_options"] = types.HttpOptions(timeout=max(1, int(timeout * 1000)))
+
+    return types.GenerateContentConfig(**options) if options else None
+
+
+@contextmanager
+def rate_limit_wait():
+    # Kuyrukta bekleme, isteğin kalan süresini aşamaz
+    left = remaining()
+    max_wait = limiter.max_wait if left is None else max(0.0, min(limiter.max_wait, left))
+
+    with stage("rate_limit"):
+        try:
+            yield max_wait
+        except RateLimitTimeout:
+            if left is not None and left <= limiter.max_wait:
+                raise DeadlineExceeded("rate limit kuyruğu süre sınırını aşıyor")
+            raise
+
+
+def acquire_token():
+    if not limiter:
+        return
+
+    with rate_limit_wait() as max_wait:
+        limiter.acquire(max_wait=max_wait)
+
+
+async def acquire_token_async():
+    # Bekleme event loop'ta asyncio.sleep ile yapılır, thread havuzunu tutmaz
+    if not limiter:
+        return
+
+    with rate_limit_wait() as max_wait:
+        await limiter.acquire_async(max_wait=max_wait)
+
+
+def hedge_token():
+    # Hedge isteği kuyrukta beklemez; kota yoksa hedge atılmaz
+    if not limiter:
+        return True
+    try:
+        limiter.reserve(max_wait=0)
+        return True
+    except RateLimitTimeout:
+        return False
+
+
+def call_model(contents, schema, stage_name="llm_attempt"):
+    acquire_token()
+
+    def send(model, timeout):
+        return client.models.generate_content(
+            model=model,
+            contents=contents,
+            config=generation_config(schema, timeout)
+        )
+
+    with stage(stage_name):
+        response = caller.call(send, can_hedge=hedge_token)
+    record_usage(response)
+    return response
+
+
+async def call_model_async(contents, schema, stage_name="llm_attempt"):
+    await acquire_token_async()
+
+    async def send(model, timeout):
+        return await client.aio.models.generate_content(
+            model=model,
+            contents=contents,
+            config=generation_config(schema, timeout)
+        )
+
+    with stage(stage_name):
+        response = await caller.call_async(send, can_hedge=hedge_token)
+    record_usage(response)
+    return response
+
+
+def assess_response(text, topic):
+    # 1) Şemaya birebir uyan temiz çıktı
+    with stage("parse"):
+        try:
+            strict = QuizResult.model_validate_json(text or "").model_dump()
+            if validate_result(strict):
+                return strict, "clean"
+        except ValidationError:
+            pass
+
+    # 2) Regex onarımı + soru bazında doğrulama
+    with stage("repair"):
+        parsed = safe_json_parse(text, topic)
+        if not parsed or not str(parsed.get("story", "")).strip():
+            return None, None
+
+        questions = [validate_question(q) for q in parsed["questions"]]
+        questions = [q for q in questions if q is not None][:QUESTION_COUNT]
+    if not questions:
+        return None, None
+
+    result = {
+        "topic": parsed.get("topic") or topic,
+        "story": str(parsed["story"]).strip(),
+        "questions": questions
+    }
+
+    if len(questions) == QUESTION_COUNT:
+        return result, "repaired"
+
+    return result, "partial"
+
+
+def build_partial_prompt(user_query, result, missing):
+    existing = "\n".join(f"- {q['question']}" for q in result["questions"])
+
+    return f"""
+SADECE JSON ÜRET.
+AÇIKLAMA YAZMA.
+KOD BLOĞU KULLANMA.
+
+SEN KPSS TARİH ALANINDA UZMAN, SORU YAZARI BİR EĞİTMENSİN.
+
+KONU: {user_query}
+
+ANLATIM:
+{result["story"]}
+
+MEVCUT SORULAR (TEKRARLAMA):
+{existing}
+
+GÖREV:
+- Bu anlatıma dayanan, yorum gerektiren TAM {missing} ADET YENİ soru üret.
+- Şıklar mantıklı ve birbirine yakın olsun.
+- explanation: neden doğru, neden diğerleri yanlış (kısa)
+
+ŞEMA DIŞINA ASLA ÇIKMA:
+
+{{
+  "questions": [
+    {{
+      "question": "string",
+      "choices": {{
+        "A": "string",
+        "B": "string",
+        "C": "string",
+        "D": "string"
+      }},
+      "answer": "A|B|C|D",
+      "explanation": "string"
+    }}
+  ]
+}}
+"""
+
+
+def parse_partial(text, topic):
+    try:
+        questions = QuestionList.model_validate_json(text or "").model_dump()["questions"]
+    except ValidationError:
+        parsed = safe_json_parse(text, topic)
+        questions = parsed["questions"] if parsed else []
+
+    questions = [validate_question(q) for q in questions]
+    return [q for q in questions if q is not None]
+
+
+def merge_partial(result, questions):
+    result["questions"] = (result["questions"] + questions)[:QUESTION_COUNT]
+    return validate_result(result)
+
+
+# Üretim yolu (deneme, onarım, kısmi yeniden üretim, retry) tek bir üreteçte
+# tanımlanır: her model çağrısı (içerik, şema, aşama) olarak dışarı verilir,
+# yanıt geri gönderilir. run_steps / run_steps_async yalnızca çağrıyı yapar.
+def regeneration_steps(user_query, result, missing=None):
+    if missing is None:
+        missing = QUESTION_COUNT - len(result["questions"])
+    log.info("PARTIAL REGEN → %d soru", missing)
+
+    response = yield (
+        build_partial_prompt(user_query, result, missing),
+        QuestionList,
+        "partial_regen"
+    )
+
+    return parse_partial(response.text, user_query)
+
+
+def generation_steps(user_query):
+    with stage("prompt_build"):
+        prompt = build_prompt(user_query)
+    best = None
+
     # 🔁 RETRY MEKANİZMASI
     for attempt in range(3):
-        print(f"LLM ATTEMPT {attempt + 1}")
+        log.debug("LLM ATTEMPT %d", attempt + 1)
 
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
-        )
+        if attempt:
+            count_path("full_retry")
+
+        try:
+            response = yield prompt, QuizResult, "llm_attempt"
+            result, path = assess_response(response.text, user_query)
+
+            if path in ("clean", "repaired"):
+                count_path(path)
+                return result
+
+            # Bozuk soruları yalnızca eksik kadar yeniden üret
+            if path == "partial":
+                best = result
+                questions = yield from regeneration_steps(user_query, result)
+                if merge_partial(result, questions):
+                    count_path("partial_regen")
+                    return result
+
+        except DeadlineExceeded:
+            # Süre doldu: elde kısmi sonuç varsa onu döndür
+            if best is None:
+                raise
+            break
+
+        log.info("RETRY NEEDED")
+
+    # Kısmi set yalnızca bu isteğe döner; önbelleğe/bankaya girmez
+    count_path("failed")
+    return best or empty_response(user_query)
+
+
+# call: adımı yürüten fonksiyon (varsayılan model çağrısı)
+def run_steps(steps, call=None):
+    call = call or call_model
+    value = error = None
+    while True:
+        try:
+            step = steps.throw(error) if error else steps.send(value)
+        except StopIteration as done:
+            return done.value
+
+        try:
+            value, error = call(*step), None
+        except Exception as e:
+            value, error = None, e
+
+
+async def run_steps_async(steps, call=None):
+    call = call or call_model_async
+    value = error = None
+    while True:
+        try:
+            step = steps.throw(error) if error else steps.send(value)
+        except StopIteration as done:
+            return done.value
+
+        try:
+            value, error = await call(*step), None
+        except Exception as e:
+            value, error = None, e
+
+
+def regenerate_questions(user_query, result, missing=None):
+    return run_steps(regeneration_steps(user_query, result, missing))
+
+
+def generate_content_from_query(user_query):
+    return run_steps(generation_steps(user_query))
 
-        parsed = safe_json_parse(response.text, user_query)
 
-        if parsed and parsed.get("questions"):
-            return parsed
+async def generate_content_from_query_async(user_query):
+    # client.aio ile worker'ı bloklamadan aynı üretim yolu
+    return await run_steps_async(generation_steps(user_query))
 
-        print("RETRY NEEDED")
 
-    return empty_response(user_query)
+def serve_ready(query):
+    # Önce banka (müfredat konuları), sonra önbellek
+    result = bank.sample(query) if bank else None
+    if result is not None:
+        return result, "bank"
 
+    result = cache.get(query) if cache else None
+    if result is not None:
+        return result, "cache"
 
-@app.route("/generate", methods=["POST"])
+    # Birincil model sorunluyken eski içerik yedek modelden de ucuzdur
+    if caller.degraded():
+        result = serve_stale(query)
+        if result is not None:
+            return result, "stale"
+
+    return None, None
+
+
+def serve_stale(query):
+    return cache.get_stale(query) if cache else None
+
+
+def remember_result(query, result):
+    # Yalnızca tam ve geçerli setler önbelleğe girer; kısmi/başarısız sonuçlar
+    # TTL boyunca o konunun cevabı olmasın
+    if cache and validate_result(result):
+        cache.put(query, result)
+
+
+def fresh_result(query):
+    result = generate_content_from_query(query)
+    remember_result(query, result)
+    return result
+
+
+async def fresh_result_async(query):
+    result = await generate_content_from_query_async(query)
+    await asyncio.to_thread(remember_result, query, result)
+    return result
+
+
+# /generate (Flask ve ASGI) ile /generate/batch'in ortak sonuç yolu: hazır
+# içerik → canlı üretim → gerekirse eski içerik. Her adım ("ready" | "fresh" |
+# "stale", konu) olarak verilir; sürücü onu sync ya da async yürütür.
+def result_steps(query):
+    if not query:
+        return empty_response(), "empty"
+
+    try:
+        with deadline_scope(GENERATE_DEADLINE):
+            result, source = yield "ready", query
+            if result is None:
+                result, source = (yield "fresh", query), "live"
+
+    except DeadlineExceeded:
+        log.warning("DEADLINE EXCEEDED: %s", query)
+        result, source = empty_response(query), "deadline"
+
+    except Exception as e:
+        log.warning("BACKEND ERROR: %s", e)
+        result, source = empty_response(query), "error"
+
+    # Kısmi/boş sonuç yerine eksiksiz eski set tercih edilir
+    if not validate_result(result):
+        stale = yield "stale", query
+        if stale is not None:
+            result, source = stale, "stale"
+
+    return result, source
+
+
+RESULT_STEPS = {"ready": serve_ready, "fresh": fresh_result, "stale": serve_stale}
+
+
+def result_step(kind, query):
+    return RESULT_STEPS[kind](query)
+
+
+def produce_result(query):
+    return run_steps(result_steps(query), result_step)
+
+
+def log_request(trace, source, query, result=None, **fields):
+    if result is not None:
+        fields["questions"] = len(result.get("questions", []))
+
+    record = end_request(trace, source, query=query, **fields)
+    if request_log:
+        request_log.write(record)
+
+
+def cache_headers(result, method):
+    # Eksik/başarısız setler ara önbelleklerde de saklanmasın
+    if method not in ("GET", "HEAD"):
+        return {}
+    if not validate_result(result):
+        return {"Cache-Control": "no-store"}
+    return {"Cache-Control": f"public, max-age={GENERATE_MAX_AGE}"}
+
+
+# Flask ve ASGI aynı gövde, ETag ve önbellek başlıklarını buradan alır.
+# Kodlama If-None-Match'ten önce seçilir: 304 de 200'ün "-br"/"-gzip"
+# ekli etiketini taşır. → (durum, gövde, başlıklar)
+def render_result(result, method, if_none_match, accept_encoding):
+    with stage("serialization"):
+        body = json_body(result)
+
+    headers = cache_headers(result, method)
+    encoding = negotiate(body, accept_encoding)
+    if encoding:
+        headers["Vary"] = "Accept-Encoding"
+
+    if validate_result(result):
+        # Aynı soru seti her zaman aynı ETag'i alır (banka/önbellek tekrarları)
+        etag = content_etag(body)
+        headers["ETag"] = f'"{representation_etag(etag, encoding)}"'
+        if method in ("GET", "HEAD") and etag_matches(if_none_match, etag):
+            return 304, b"", headers
+
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+
+    return 200, body, headers
+
+
+def cacheable_response(result):
+    status, body, headers = render_result(
+        result,
+        request.method,
+        request.headers.get("If-None-Match"),
+        request.headers.get("Accept-Encoding")
+    )
+    if status == 304:
+        return not_modified(headers.pop("ETag").strip('"'), headers)
+
+    response = Response(body, mimetype="application/json")
+    response.headers.update(headers)
+    return response
+
+
+@app.route("/generate", methods=["GET", "POST"])
 def generate():
+    trace = begin_request("/generate")
+    if request.method == "GET":
+        query = request.args.get("query")
+    else:
+        data = request.get_json(silent=True)
+        query = data.get("query") if data else None
+
+    result, source = produce_result(query)
+    response = cacheable_response(result)
+
+    log_request(trace, source, query, result, status=response.status_code)
+    return response
+
+
+# Akan yanıtın olaylarını toplar. Hikâyeden önce kapanan sorular, hikâye
+# gelene kadar bekletilir; hikâyesi olmayan soruların dayanağı yoktur.
+class StreamAssembler:
+    def __init__(self, user_query):
+        self.user_query = user_query
+        self.result = empty_response(user_query)
+        self.parser = StreamingResultParser()
+        self.pending = []
+        self.started = time.perf_counter()
+        self.last_chunk = None
+
+    def _accept(self, question):
+        self.result["questions"].append(question)
+        return {"type": "question", "question": question}
+
+    def feed(self, chunk):
+        check_deadline()
+        self.last_chunk = chunk
+        result = self.result
+
+        events = []
+        for kind, value in self.parser.feed(chunk.text):
+            if kind == "question":
+                question = parse_question(value)
+                if question is None:
+                    continue
+                if len(result["questions"]) + len(self.pending) >= QUESTION_COUNT:
+                    continue
+                if not result["story"]:
+                    self.pending.append(question)
+                    continue
+                events.append(self._accept(question))
+
+            elif kind == "story":
+                story = str(value).strip()
+                if not story or result["story"]:
+                    continue
+                result["story"] = story
+                events.append({"type": "story", "story": story})
+                events += [self._accept(q) for q in self.pending]
+                self.pending = []
+
+            else:
+                result[kind] = value
+                events.append({"type": kind, kind: value})
+
+        return events
+
+    def upstream_done(self):
+        # Son parçadaki usage_metadata tüm akışın toplamını taşır
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, stage="llm_stream")
+        if self.last_chunk is not None:
+            record_usage(self.last_chunk)
+        self._story = self.result["story"]
+        self._count = len(self.result["questions"])
+
+    def completion_steps(self):
+        result = self.result
+
+        if not result["story"]:
+            # Hikâyesiz akış: klasik retry yoluna düş
+            log.info("STREAM FALLBACK")
+            fallback = yield from generation_steps(self.user_query)
+            result["story"] = fallback.get("story", "")
+            questions = [validate_question(q) for q in fallback.get("questions", [])]
+            result["questions"] = [q for q in questions if q is not None]
+            return
+
+        if len(result["questions"]) >= QUESTION_COUNT:
+            count_path("clean")
+            return
+
+        # Eksik sorular akan hikâyeye dayanarak tamamlanır
+        for _ in range(2):
+            missing = QUESTION_COUNT - len(result["questions"])
+            if not missing:
+                break
+            try:
+                questions = yield from regeneration_steps(self.user_query, result)
+            except Exception as e:
+                log.warning("STREAM REGEN ERROR: %s", e)
+                break
+            result["questions"] += questions[:missing]
+
+        count_path("partial_regen" if validate_result(result) else "failed")
+
+    def completion_events(self):
+        events = []
+        if self.result["story"] != self._story:
+            events.append({"type": "story", "story": self.result["story"]})
+        events += [
+            {"type": "question", "question": q}
+            for q in self.result["questions"][self._count:]
+        ]
+        events.append({"type": "done", "result": self.result})
+        return events
+
+
+def open_stream_request(user_query):
+    with stage("prompt_build"):
+        prompt = build_prompt(user_query)
+    model = caller.route()
+    return model, {
+        "model": model,
+        "contents": prompt,
+        "config": generation_config(QuizResult, remaining()),
+    }
+
+
+# 🌊 Hikâye ve her soru kapanır kapanmaz gönderilir
+def stream_content_from_query(user_query):
+    assembler = StreamAssembler(user_query)
+    model = outcome = None
+    try:
+        acquire_token()
+        model, request_args = open_stream_request(user_query)
+        for chunk in client.models.generate_content_stream(**request_args):
+            yield from assembler.feed(chunk)
+        outcome = True
+
+    except Exception as e:
+        log.warning("STREAM ERROR: %s", e)
+        outcome = False
+
+    finally:
+        # İstemci koparsa (GeneratorExit) sonuç None: half-open denemesi bırakılır
+        if model is not None:
+            caller.observe(model, outcome, time.perf_counter() - assembler.started)
+
+    assembler.upstream_done()
+    run_steps(assembler.completion_steps())
+    yield from assembler.completion_events()
+
+
+async def stream_content_from_query_async(user_query):
+    assembler = StreamAssembler(user_query)
+    model = outcome = None
+    try:
+        await acquire_token_async()
+        model, request_args = open_stream_request(user_query)
+        async for chunk in await client.aio.models.generate_content_stream(**request_args):
+            for event in assembler.feed(chunk):
+                yield event
+        outcome = True
+
+    except Exception as e:
+        log.warning("STREAM ERROR: %s", e)
+        outcome = False
+
+    finally:
+        # İstemci koparsa/iptal edilirse sonuç None: half-open denemesi bırakılır
+        if model is not None:
+            caller.observe(model, outcome, time.perf_counter() - assembler.started)
+
+    assembler.upstream_done()
+    await run_steps_async(assembler.completion_steps())
+    for event in assembler.completion_events():
+        yield event
+
+
+def ndjson(event):
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+
+def replay_events(result, query):
+    yield ndjson({"type": "topic", "topic": result.get("topic", query)})
+    yield ndjson({"type": "story", "story": result.get("story", "")})
+    for question in result.get("questions", []):
+        yield ndjson({"type": "question", "question": question})
+    yield ndjson({"type": "done", "result": result})
+
+
+def stream_failed(query, error, sent):
+    # Henüz soru gönderilmediyse eski içerikle tamamla → (sonuç, kaynak, satırlar)
+    log.warning("BACKEND ERROR: %s", error)
+    source = "deadline" if isinstance(error, DeadlineExceeded) else "error"
+
+    stale = None if sent else serve_stale(query)
+    if stale is not None:
+        return stale, "stale", list(replay_events(stale, query))
+
+    result = empty_response(query)
+    return result, source, [ndjson({"type": "done", "result": result})]
+
+
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@app.route("/generate/stream", methods=["POST"])
+def generate_stream():
     data = request.get_json(silent=True)
     query = data.get("query") if data else None
 
-    if not query:
-        return jsonify(empty_response()), 200
+    def events():
+        trace = begin_request("/generate/stream")
+        first_event_ms = None
+        result = empty_response(query or "")
+
+        if not query:
+            yield ndjson({"type": "done", "result": result})
+            log_request(trace, "empty", query, result)
+            return
+
+        cached, source = serve_ready(query)
+        if cached is not None:
+            result = cached
+            yield from replay_events(cached, query)
+            log_request(trace, source, query, result)
+            return
+
+        source, sent = "live", False
+        try:
+            with deadline_scope(GENERATE_DEADLINE):
+                for event in stream_content_from_query(query):
+                    if first_event_ms is None:
+                        first_event_ms = round((time.perf_counter() - trace.started) * 1000, 2)
+                    if event["type"] == "done":
+                        result = event["result"]
+                        remember_result(query, result)
+                    sent = sent or event["type"] == "question"
+                    yield ndjson(event)
+
+        except Exception as e:
+            result, source, lines = stream_failed(query, e, sent)
+            yield from lines
+
+        log_request(trace, source, query, result, first_event_ms=first_event_ms)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="application/x-ndjson",
+        headers=STREAM_HEADERS
+    )
+
+
+def parse_batch_items(data):
+    topics = data.get("topics") if isinstance(data, dict) else None
+    if not isinstance(topics, list):
+        return []
+
+    items = []
+    for item in topics[:BATCH_MAX_TOPICS]:
+        if isinstance(item, str):
+            item = {"query": item}
+        if not isinstance(item, dict) or not str(item.get("query", "")).strip():
+            continue
+
+        try:
+            count = int(item.get("count", QUESTION_COUNT))
+        except (TypeError, ValueError):
+            count = QUESTION_COUNT
+
+        items.append({
+            "query": str(item["query"]).strip(),
+            "count": max(1, min(count, BATCH_MAX_QUESTIONS))
+        })
+    return items
+
+
+def generate_batch_item(index, item):
+    query, count = item["query"], item["count"]
+
+    # İlk set banka/önbellekten gelebilir
+    result, source = produce_result(query)
+
+    # Kopya üzerinde çalışılır: banka/önbellekteki set değişmez
+    result = dict(result, questions=list(result.get("questions", []))[:count])
+    seen = {q.get("question") for q in result["questions"]}
+
+    # Fazla sorular aynı hikâyeye dayanarak, eksik kadar üretilir
+    while result.get("story") and len(result["questions"]) < count:
+        missing = min(QUESTION_COUNT, count - len(result["questions"]))
+        try:
+            with deadline_scope(GENERATE_DEADLINE):
+                questions = regenerate_questions(query, result, missing)
+        except DeadlineExceeded:
+            log.info("BATCH DEADLINE → %s", query)
+            break
+
+        fresh = [q for q in questions if q["question"] not in seen][:missing]
+        if not fresh:
+            break
+        seen.update(q["question"] for q in fresh)
+        result["questions"] += fresh
+
+    return {"index": index, "query": query, "source": source, "result": result}
+
+
+def batch_deadline(topics, workers):
+    # Eşzamanlılık sınırının arkasında sıra bekleyen konular da kendi turunu alır
+    rounds = -(-topics // workers)
+    deadline = rounds * GENERATE_DEADLINE
+    return min(deadline, BATCH_DEADLINE) if BATCH_DEADLINE else deadline
+
 
+def run_batch(items, concurrency):
+    # Sonuçlar konu bittikçe (tamamlanma sırasıyla) döner. Her konu, toplu
+    # isteğin süre sınırını kopyalanan context üzerinden devralır.
+    workers = max(1, min(concurrency, BATCH_CONCURRENCY, len(items)))
+    pool = ThreadPoolExecutor(max_workers=workers)
     try:
-        result = generate_content_from_query(query)
-        print("FINAL RESULT →", result)
-        return jsonify(result), 200
+        with deadline_scope(batch_deadline(len(items), workers)):
+            futures = {
+                pool.submit(copy_context().run, generate_batch_item, index, item): index
+                for index, item in enumerate(items)
+            }
+
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                yield future.result()
+            except Exception as e:
+                log.warning("BATCH ERROR: %s", e)
+                query = items[index]["query"]
+                yield {
+                    "index": index,
+                    "query": query,
+                    "source": "deadline" if isinstance(e, DeadlineExceeded) else "error",
+                    "result": empty_response(query)
+                }
+
+    finally:
+        # İstemci akışı keserse sıradaki konular hiç başlamaz; çalışanlar
+        # kendi süre sınırıyla biter, istek thread'i onları beklemez
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@app.route("/generate/batch", methods=["POST"])
+def generate_batch():
+    data = request.get_json(silent=True)
+    items = parse_batch_items(data)
+    stream = bool(data.get("stream")) if isinstance(data, dict) else False
+
+    try:
+        concurrency = int(data.get("concurrency", BATCH_CONCURRENCY))
+    except (AttributeError, TypeError, ValueError):
+        concurrency = BATCH_CONCURRENCY
+
+    if stream:
+        def events():
+            trace = begin_request("/generate/batch")
+            total = 0
+            for entry in run_batch(items, concurrency):
+                total += len(entry["result"].get("questions", []))
+                yield ndjson(dict(entry, type="result"))
+            yield ndjson({"type": "done", "count": len(items)})
+            log_request(trace, "batch", None, questions=total, topics=len(items))
+
+        return Response(
+            stream_with_context(events()),
+            mimetype="application/x-ndjson",
+            headers=STREAM_HEADERS
+        )
+
+    trace = begin_request("/generate/batch")
+    results = [None] * len(items)
+    for entry in run_batch(items, concurrency):
+        results[entry["index"]] = entry
+
+    with stage("serialization"):
+        response = jsonify({"results": results})
+
+    total = sum(len(entry["result"].get("questions", [])) for entry in results)
+    log_request(trace, "batch", None, questions=total, topics=len(items))
+    return response, 200
+
+
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(cache.stats() if cache else {"enabled": False}), 200
+
+
+@app.route("/generation/stats")
+def generation_stats():
+    with path_lock:
+        counts = dict(path_counts)
+    return jsonify({"structured_output": STRUCTURED_OUTPUT, "paths": counts}), 200
 
-    except Exception as e:
-        print("BACKEND ERROR:", str(e))
-        return jsonify(empty_response(query)), 200
+
+@app.route("/bank/stats")
+def bank_stats():
+    return jsonify(bank.stats() if bank else {"enabled": False}), 200
+
+
+def collect_app_metrics():
+    with path_lock:
+        counts = dict(path_counts)
+
+    metrics = [(
+        "kpss_generation_path_total", "counter",
+        "Üretim yolu sayaçları (clean, repaired, partial_regen, full_retry, failed)",
+        {(("path", path),): value for path, value in counts.items()}
+    )]
+
+    if cache:
+        stats = cache.stats()
+        metrics += [
+            ("kpss_cache_hits_total", "counter", "Önbellek isabetleri", stats["hits"]),
+            ("kpss_cache_misses_total", "counter", "Önbellek ıskaları", stats["misses"]),
+            ("kpss_cache_evictions_total", "counter", "Önbellekten atılan kayıtlar", stats["evictions"]),
+        ]
+
+    if bank:
+        stats = bank.stats()
+        metrics += [
+            ("kpss_bank_hits_total", "counter", "Bankadan sunulan setler", stats["hits"]),
+            ("kpss_bank_sets", "gauge", "Sunulabilir banka setleri", stats["sets"]),
+        ]
+
+    if limiter:
+        stats = limiter.stats()
+        metrics += [
+            ("kpss_ratelimit_acquired_total", "counter", "Rate limiter'dan geçen çağrılar", stats["acquired"]),
+            ("kpss_ratelimit_waited_total", "counter", "Kuyrukta bekleyen çağrılar", stats["waited"]),
+            ("kpss_ratelimit_wait_seconds_total", "counter", "Kuyrukta geçen toplam süre", stats["wait_seconds"]),
+            ("kpss_ratelimit_timeouts_total", "counter", "Azami bekleme aşıldığı için reddedilenler", stats["timeouts"]),
+        ]
+
+    stats = caller.stats()
+    metrics += [
+        ("kpss_breaker_open", "gauge", "Birincil model devre kesicisi açık mı (1/0)", int(stats["breaker_state"] != "closed")),
+        ("kpss_breaker_opened_total", "counter", "Devre kesicinin açılma sayısı", stats["breaker_opened"]),
+        ("kpss_hedges_total", "counter", "Gönderilen hedge istekleri", stats["hedges"]),
+        ("kpss_hedge_wins_total", "counter", "Birincilden önce biten hedge istekleri", stats["hedge_wins"]),
+        ("kpss_fallback_calls_total", "counter", "Yedek modele yönlendirilen çağrılar", stats["fallbacks"]),
+        ("kpss_deadline_exceeded_total", "counter", "Süre sınırını aşan LLM çağrıları", stats["deadline_exceeded"]),
+        ("kpss_hedge_after_seconds", "gauge", "Öğrenilmiş hedge eşiği", stats["hedge_after"]),
+    ]
+
+    if request_log:
+        metrics.append((
+            "kpss_request_log_dropped_total", "counter",
+            "Kuyruk dolduğu için düşen günlük kayıtları", request_log.dropped
+        ))
+
+    return metrics
+
+
+register_collector(collect_app_metrics)
+
+
+@app.route("/metrics")
+def metrics():
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+# 🏦 Banka doldurucu: eşik altına düşen konuları arka planda tamamlar
+if bank and os.getenv("BANK_REFILL", "1") == "1":
+    BankRefiller(
+        bank,
+        generate_content_from_query,
+        validate_result,
+        low=int(os.getenv("BANK_LOW_WATERMARK", "3")),
+        high=int(os.getenv("BANK_HIGH_WATERMARK", "10")),
+        interval=int(os.getenv("BANK_REFILL_INTERVAL", "60")),
+    ).start()
 
 
 @app.route("/ping")
@@ -151,4 +1148,9 @@ def ping():
 
 @app.route("/")
 def index():
-    return send_from_directory(".", "index.html")
+    return INDEX.response(request)
+
+
+@app.after_request
+def compress_json(response):
+    return compress_response(response, request)
@@ -0,0 +1,232 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from app import (
+    GENERATE_DEADLINE, STREAM_HEADERS, app, empty_response, fresh_result_async,
+    log_request, ndjson, remember_result, render_result, replay_events,
+    result_step, result_steps, run_steps_async, serve_ready,
+    stream_content_from_query_async, stream_failed
+)
+from cache import normalize_topic
+from metrics import begin_request, register_collector
+from resilience import deadline_scope
+from singleflight import AsyncSingleFlight, AsyncStreamFlight
+
+# ⚡ ASYNC SERVİS
+# /generate (GET ve POST) ve /generate/stream tek bir event loop üzerinde
+# client.aio ile çalışır; böylece bir süreç yüzlerce bekleyen LLM çağrısını
+# taşıyabilir. Diğer tüm rotalar (/ping, /, /generate/batch ...) mevcut Flask
+# uygulamasına, WSGI_THREADS boyutlu bir thread havuzu üzerinden devredilir.
+#
+#   gunicorn -k uvicorn.workers.UvicornWorker asgi:application
+#   uvicorn asgi:application
+
+# Flask'a devredilen istekler gerçek bir thread havuzunda çalışır. asgiref'in
+# varsayılanı (thread_sensitive=True) tüm WSGI isteklerini süreç başına tek
+# thread'de sıraya sokar; uzun bir istek /ping'i bile bekletir.
+# run_wsgi_app.__wrapped__ asgiref'in iç yapısıdır: sürüm requirements.txt'te
+# sabitlenmiştir, yükseltirken bu sınıf yeniden doğrulanmalı.
+WSGI_THREADS = int(os.getenv("WSGI_THREADS", "64"))
+wsgi_pool = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    run_wsgi_app = sync_to_async(
+        WsgiToAsgiInstance.run_wsgi_app.__wrapped__,
+        thread_sensitive=False,
+        executor=wsgi_pool
+    )
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        instance = PooledWsgiInstance(self.wsgi_application, self.duplicate_header_limit)
+        await instance(scope, receive, send)
+
+
+flask_app = PooledWsgiToAsgi(app)
+flights = AsyncSingleFlight()
+stream_flights = AsyncStreamFlight()
+
+
+def collect_flight_metrics():
+    stats = {kind: flight.stats() for kind, flight in (("generate", flights), ("stream", stream_flights))}
+
+    def samples(field):
+        return {(("kind", kind),): values[field] for kind, values in stats.items()}
+
+    return [
+        ("kpss_singleflight_calls_total", "counter", "Upstream'e giden birleşik çağrılar", samples("calls")),
+        ("kpss_singleflight_shared_total", "counter", "Uçuştaki çağrıya eklenen istekler", samples("shared")),
+        ("kpss_singleflight_inflight", "gauge", "Şu an uçuştaki konular", samples("inflight")),
+    ]
+
+
+register_collector(collect_flight_metrics)
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+def header(scope, name):
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def base_headers(extra):
+    headers = {"Access-Control-Allow-Origin": "*", "Vary": "Accept-Encoding", **extra}
+    return [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+
+
+async def send_response(send, status, body, headers):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def read_query(scope, receive):
+    if scope["method"] == "GET":
+        return parse_qs(scope.get("query_string", b"").decode("latin-1")).get("query", [None])[0]
+
+    try:
+        data = json.loads(await read_body(receive) or b"null")
+    except ValueError:
+        data = None
+    return data.get("query") if isinstance(data, dict) else None
+
+
+def flight_key(query):
+    return normalize_topic(query) or query
+
+
+# app.result_steps'in async sürücüsü: canlı üretim aynı normalize konu için
+# uçuştaki çağrıyı paylaşır, diğer adımlar (SQLite) thread'de çalışır
+async def result_step_async(kind, query):
+    if kind == "fresh":
+        return await flights.do(flight_key(query), lambda: fresh_result_async(query))
+    return await asyncio.to_thread(result_step, kind, query)
+
+
+async def generate(scope, receive, send):
+    trace = begin_request("/generate")
+    query = await read_query(scope, receive)
+
+    shared = bool(query) and flights.inflight(flight_key(query))
+    result, source = await run_steps_async(result_steps(query), result_step_async)
+    if shared and source == "live":
+        source = "coalesced"
+
+    # Serileştirme ve sıkıştırma event loop'u bloklamasın
+    status, body, extra = await asyncio.to_thread(
+        render_result, result, scope["method"],
+        header(scope, b"if-none-match"), header(scope, b"accept-encoding")
+    )
+
+    headers = base_headers(extra)
+    if status == 200:
+        headers += [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+    await send_response(send, status, body, headers)
+
+    log_request(trace, source, query, result, status=status)
+
+
+async def stream_and_remember(query):
+    async for event in stream_content_from_query_async(query):
+        if event["type"] == "done":
+            await asyncio.to_thread(remember_result, query, event["result"])
+        yield event
+
+
+async def generate_stream(scope, receive, send):
+    trace = begin_request("/generate/stream")
+    query = await read_query(scope, receive)
+
+    headers = [(b"content-type", b"application/x-ndjson")] + base_headers(STREAM_HEADERS)
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+
+    async def emit(line):
+        await send({"type": "http.response.body", "body": line.encode(), "more_body": True})
+
+    first_event_ms = None
+    result = empty_response(query or "")
+
+    if not query:
+        source = "empty"
+        await emit(ndjson({"type": "done", "result": result}))
+
+    else:
+        cached, source = await asyncio.to_thread(serve_ready, query)
+        if cached is not None:
+            result = cached
+            for line in replay_events(cached, query):
+                await emit(line)
+
+        else:
+            # Aynı konuyu bekleyen istemciler tek upstream akışını paylaşır
+            key = flight_key(query)
+            source = "coalesced" if stream_flights.inflight(key) else "live"
+            sent = False
+            try:
+                with deadline_scope(GENERATE_DEADLINE):
+                    async for event in stream_flights.subscribe(key, lambda: stream_and_remember(query)):
+                        if first_event_ms is None:
+                            first_event_ms = round((time.perf_counter() - trace.started) * 1000, 2)
+                        if event["type"] == "done":
+                            result = event["result"]
+                        sent = sent or event["type"] == "question"
+                        await emit(ndjson(event))
+
+            except Exception as e:
+                result, source, lines = await asyncio.to_thread(stream_failed, query, e, sent)
+                for line in lines:
+                    await emit(line)
+
+    await send({"type": "http.response.body", "body": b""})
+    log_request(trace, source, query, result, first_event_ms=first_event_ms)
+
+
+ROUTES = {
+    ("/generate", "GET"): generate,
+    ("/generate", "POST"): generate,
+    ("/generate/stream", "POST"): generate_stream,
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+
+    handler = ROUTES.get((scope["path"], scope["method"])) if scope["type"] == "http" else None
+    if handler is not None:
+        await handler(scope, receive, send)
+        return
+
+    await flask_app(scope, receive, send)
@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+from cache import normalize_topic
+
+log = logging.getLogger("kpss.bank")
+
+
+# Önceden üretilmiş soru setleri bankası.
+# Konu → set id listesi bellekte tutulur; istek anında rastgele bir id seçilip
+# birincil anahtarla okunur (O(1)). Her set BANK_MAX_SERVES kez sunulduktan
+# sonra emekliye ayrılır, böylece doldurucu (refiller) içeriği tazeler.
+class QuestionBank:
+    def __init__(self, path, max_serves=50, recent=3, reload_interval=30):
+        self.path = path
+        self.max_serves = max_serves
+        self.recent = recent
+        self.reload_interval = reload_interval
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._topics = {}
+        self._ids = {}
+        self._recent = {}
+        self._loaded_at = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        self._init_db()
+        self.reload()
+
+    # ---------- SQLite ----------
+
+    def _conn(self):
+        # gunicorn --preload: fork edilen worker üst sürecin bağlantısını kullanmaz
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._local = threading.local()
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS topics (
+                    key TEXT PRIMARY KEY,
+                    topic TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sets (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    served INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS sets_key ON sets (key, served)"
+            )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires REAL NOT NULL
+                )
+            """)
+
+    def reload(self):
+        conn = self._conn()
+        topics = dict(conn.execute("SELECT key, topic FROM topics"))
+
+        ids = {key: [] for key in topics}
+        rows = conn.execute(
+            "SELECT id, key FROM sets WHERE served < ?", (self.max_serves,)
+        )
+        for set_id, key in rows:
+            ids.setdefault(key, []).append(set_id)
+
+        with self._lock:
+            self._topics = topics
+            self._ids = ids
+            self._loaded_at = time.time()
+
+    def _maybe_reload(self):
+        if time.time() - self._loaded_at > self.reload_interval:
+            self.reload()
+
+    # ---------- Yazma ----------
+
+    def add_topic(self, topic):
+        key = normalize_topic(topic)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO topics (key, topic) VALUES (?, ?)",
+                (key, topic)
+            )
+        with self._lock:
+            self._topics.setdefault(key, topic)
+            self._ids.setdefault(key, [])
+        return key
+
+    def add(self, topic, result):
+        key = self.add_topic(topic)
+        conn = self._conn()
+        with conn:
+            set_id = conn.execute(
+                "INSERT INTO sets (key, payload, created) VALUES (?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), time.time())
+            ).lastrowid
+        with self._lock:
+            self._ids[key].append(set_id)
+        return set_id
+
+    # ---------- Okuma ----------
+
+    def available(self, key):
+        with self._lock:
+            return len(self._ids.get(key, []))
+
+    def topics(self):
+        with self._lock:
+            return dict(self._topics)
+
+    def sample(self, topic):
+        key = normalize_topic(topic)
+        self._maybe_reload()
+
+        with self._lock:
+            ids = self._ids.get(key)
+            if not ids:
+                if key in self._topics:
+                    self.misses += 1
+                return None
+
+            # Son sunulan setleri tekrar etme (banka yetiyorsa)
+            recent = self._recent.setdefault(key, deque(maxlen=self.recent))
+            fresh = [i for i in ids if i not in recent]
+            set_id = random.choice(fresh or ids)
+            recent.append(set_id)
+
+        conn = self._conn()
+        with conn:
+            row = conn.execute(
+                "UPDATE sets SET served = served + 1 WHERE id = ? "
+                "RETURNING payload, served",
+                (set_id,)
+            ).fetchone()
+
+        if row is None:
+            self._forget(key, set_id)
+            return self.sample(topic)
+
+        payload, served = row
+        if served >= self.max_serves:
+            self._forget(key, set_id)
+
+        self.hits += 1
+        return json.loads(payload)
+
+    def _forget(self, key, set_id):
+        with self._lock:
+            ids = self._ids.get(key, [])
+            if set_id in ids:
+                ids.remove(set_id)
+
+    # ---------- Worker'lar arası kilit ----------
+
+    def acquire_lease(self, name, owner, ttl):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, "
+                "expires = excluded.expires "
+                "WHERE leases.expires < ? OR leases.owner = excluded.owner",
+                (name, owner, now + ttl, now)
+            )
+            row = conn.execute(
+                "SELECT owner FROM leases WHERE name = ?", (name,)
+            ).fetchone()
+        return row is not None and row[0] == owner
+
+    def stats(self):
+        with self._lock:
+            topics = len(self._topics)
+            sets = sum(len(ids) for ids in self._ids.values())
+        return {
+            "topics": topics,
+            "sets": sets,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Bankası eşik altına düşen konuları arka planda tamamlar.
+# Birden fazla gunicorn worker'ı varken yalnızca kilidi alan çalışır.
+class BankRefiller(threading.Thread):
+    def __init__(self, bank, generate, validate, low=3, high=10, interval=60):
+        super().__init__(daemon=True)
+        self.bank = bank
+        self.generate = generate
+        self.validate = validate
+        self.low = low
+        self.high = high
+        self.interval = interval
+        self.owner = uuid.uuid4().hex
+
+    def run(self):
+        while True:
+            try:
+                if self.bank.acquire_lease("refill", self.owner, self.interval * 2):
+                    self.refill_once()
+            except Exception as e:
+                log.warning("REFILL ERROR: %s", e)
+            time.sleep(self.interval)
+
+    def refill_once(self):
+        self.bank.reload()
+        for key, topic in self.bank.topics().items():
+            if self.bank.available(key) >= self.low:
+                continue
+
+            log.info("REFILL → %s", topic)
+            while self.bank.available(key) < self.high:
+                # Uzun turlarda kilidi tazele; başka worker devraldıysa bırak
+                if not self.bank.acquire_lease("refill", self.owner, self.interval * 2):
+                    return
+                result = self.generate(topic)
+                if not self.validate(result):
+                    log.warning("REFILL REJECTED: %s", topic)
+                    break
+                self.bank.add(topic, result)
+
+
+def bank_from_env():
+    if os.getenv("BANK_ENABLED", "1") == "0":
+        return None
+
+    return QuestionBank(
+        path=os.getenv("BANK_PATH", "bank.sqlite3"),
+        max_serves=int(os.getenv("BANK_MAX_SERVES", "50")),
+        recent=int(os.getenv("BANK_RECENT", "3")),
+        reload_interval=int(os.getenv("BANK_RELOAD_INTERVAL", "30")),
+    )
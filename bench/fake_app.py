@@ -0,0 +1,29 @@
+import os
+import tempfile
+
+# Benchmark sırasında gerçek anahtar ve arka plan işleri gerekmez;
+# önbellek ve banka varsayılan olarak kapalıdır ki LLM yolu ölçülsün.
+os.environ.setdefault("GEMINI_API_KEY", "fake")
+os.environ.setdefault("CACHE_ENABLED", "0")
+os.environ.setdefault("BANK_ENABLED", "0")
+os.environ.setdefault("BANK_REFILL", "0")
+# Gerçek kota yok; ölçümü rate limiter değil uygulama belirlesin
+os.environ.setdefault("RATE_LIMIT_RPM", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault(
+    "REQUEST_LOG_PATH", os.path.join(tempfile.gettempdir(), "kpss_bench_requests.jsonl")
+)
+os.environ.setdefault(
+    "METRICS_PATH", os.path.join(tempfile.gettempdir(), "kpss_bench_metrics.sqlite3")
+)
+
+import app as app_module  # noqa: E402
+from bench.fake_client import FakeClient  # noqa: E402
+
+# app.py içindeki tüm yollar modül seviyesindeki `client`i kullanır
+app_module.client = FakeClient.from_env()
+
+app = app_module.app
+
+# gunicorn -k uvicorn.workers.UvicornWorker bench.fake_app:application
+from asgi import application  # noqa: E402,F401
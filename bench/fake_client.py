@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# 🧪 SAHTE GEMINI İSTEMCİSİ
+# app.client yerine takılır; kayıtlı (bozuk olanlar dahil) yanıtları
+# ayarlanabilir gecikme dağılımı ve hata oranıyla tekrar oynatır.
+#
+#   FAKE_LATENCY       fixed:1.2 | uniform:0.5:2.0 | lognormal:1.5:0.4 (saniye)
+#   FAKE_FAILURE_RATE  0.0 - 1.0 arası istisna olasılığı
+#   FAKE_MIX           clean=70,fenced=10,partial=5 ... (tür=ağırlık)
+#   FAKE_SEED          tekrarlanabilir çalıştırmalar için
+#   FAKE_CALL_LOG      her upstream çağrıda bir bayt eklenen dosya
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+DEFAULT_MIX = {
+    "clean": 70,
+    "fenced": 8,
+    "prose_prefix": 4,
+    "trailing_comma": 4,
+    "missing_comma": 3,
+    "partial": 4,
+    "short": 2,
+    "truncated": 2,
+    "empty_story": 1,
+    "garbage": 2,
+}
+
+
+def load_responses(path):
+    responses = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                responses.setdefault(row["kind"], []).append(row["text"])
+    return responses
+
+
+def parse_mix(spec):
+    if not spec:
+        return dict(DEFAULT_MIX)
+
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+def parse_latency(spec, rng):
+    kind, *params = (spec or "fixed:0").split(":")
+    params = [float(p) for p in params]
+
+    if kind == "fixed":
+        return lambda: params[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(params[0], params[1])
+    if kind == "lognormal":
+        # params: medyan, sigma
+        median, sigma = params
+        return lambda: median * rng.lognormvariate(0, sigma)
+
+    raise ValueError(f"Bilinmeyen gecikme dağılımı: {spec}")
+
+
+class FakeUpstreamError(Exception):
+    pass
+
+
+class FakeModels:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def generate_content(self, model, contents, config=None):
+        text, delay, error = self.backend.next(contents)
+        time.sleep(delay)
+        if error:
+            raise error
+        return self.backend.response(text)
+
+    def generate_content_stream(self, model, contents, config=None):
+        text, delay, error = self.backend.next(contents)
+        if error:
+            time.sleep(delay)
+            raise error
+
+        chunks = self.backend.chunks(text)
+        for chunk in chunks:
+            time.sleep(delay / len(chunks))
+            yield self.backend.response(chunk)
+
+
+class FakeAsyncModels:
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def generate_content(self, model, contents, config=None):
+        text, delay, error = self.backend.next(contents)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return self.backend.response(text)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        # client.aio gibi: await edilince async iterator döner
+        text, delay, error = self.backend.next(contents)
+        if error:
+            await asyncio.sleep(delay)
+            raise error
+
+        chunks = self.backend.chunks(text)
+
+        async def stream():
+            for chunk in chunks:
+                await asyncio.sleep(delay / len(chunks))
+                yield self.backend.response(chunk)
+
+        return stream()
+
+
+class FakeClient:
+    def __init__(self, responses=None, partial=None, mix=None, latency="fixed:0",
+                 failure_rate=0.0, seed=None, call_log=None, chunk_size=64):
+        self.rng = random.Random(seed)
+        self.responses = responses or load_responses(FIXTURES / "responses.jsonl")
+        self.partial = partial or load_responses(FIXTURES / "partial.jsonl")
+        self.mix = {k: w for k, w in (mix or DEFAULT_MIX).items() if k in self.responses}
+        self.latency = parse_latency(latency, self.rng)
+        self.failure_rate = failure_rate
+        self.call_log = call_log
+        self.chunk_size = chunk_size
+
+        self.calls = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+        self.models = FakeModels(self)
+        self.aio = SimpleNamespace(models=FakeAsyncModels(self))
+
+    @classmethod
+    def from_env(cls):
+        seed = os.getenv("FAKE_SEED")
+        return cls(
+            mix=parse_mix(os.getenv("FAKE_MIX")),
+            latency=os.getenv("FAKE_LATENCY", "lognormal:1.5:0.4"),
+            failure_rate=float(os.getenv("FAKE_FAILURE_RATE", "0")),
+            seed=int(seed) if seed else None,
+            call_log=os.getenv("FAKE_CALL_LOG"),
+        )
+
+    def next(self, contents):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency())
+            failed = self.rng.random() < self.failure_rate
+
+            # Kısmi yeniden üretim istemleri yalnızca soru listesi bekler
+            if "MEVCUT SORULAR" in str(contents):
+                text = self.rng.choice(self.partial["clean"])
+            else:
+                kinds = list(self.mix)
+                kind = self.rng.choices(kinds, weights=[self.mix[k] for k in kinds])[0]
+                text = self.rng.choice(self.responses[kind])
+
+            if failed:
+                self.failures += 1
+
+        if self.call_log:
+            with open(self.call_log, "ab") as f:
+                f.write(b"x" if not failed else b"!")
+
+        error = FakeUpstreamError("fake upstream failure") if failed else None
+        return text, delay, error
+
+    def chunks(self, text):
+        size = self.chunk_size
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    def response(self, text):
+        tokens = max(1, len(text) // 4)
+        return SimpleNamespace(
+            text=text,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=600,
+                candidates_token_count=tokens,
+                total_token_count=600 + tokens,
+            ),
+        )
@@ -0,0 +1,256 @@
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from bench.stats import compare, load_baseline, save_baseline, summarize
+
+# 🚦 YÜK TESTİ
+# Sahte Gemini istemcisiyle (bench/fake_app.py) gunicorn'u farklı worker
+# sayıları ve sınıflarıyla başlatır, POST /generate'e (ya da --endpoint stream
+# ile /generate/stream'e) kapalı döngü yük verir. Yük sürerken /ping ayrıca
+# yoklanır; uzun akışların diğer rotaları bekletip bekletmediği ping_p95'te
+# görünür.
+#
+#   python -m bench.load --workers 1,4 --worker-class sync,gthread \
+#       --concurrency 16 --requests 120 --latency lognormal:1.5:0.4
+#
+#   python -m bench.load --endpoint stream --workers 1 \
+#       --worker-class uvicorn.workers.UvicornWorker --latency fixed:2 \
+#       --concurrency 8 --requests 16
+#
+# bench/baseline_load.json varsayılan parametrelerle kaydedilmiştir:
+#   python -m bench.load --baseline bench/baseline_load.json [--save-baseline]
+
+ROOT = Path(__file__).resolve().parent.parent
+ASGI_WORKERS = ("uvicorn.workers.UvicornWorker", "uvicorn_worker.UvicornWorker")
+
+
+def wait_ready(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/ping", timeout=1) as res:
+                if res.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def start_server(workers, worker_class, threads, port, env):
+    target = "bench.fake_app:application" if worker_class in ASGI_WORKERS else "bench.fake_app:app"
+    cmd = [
+        sys.executable, "-m", "gunicorn",
+        "-w", str(workers),
+        "-k", worker_class,
+        # sync + threads>1 gunicorn'da sessizce gthread'e dönüşür
+        "--threads", str(threads if worker_class == "gthread" else 1),
+        "-b", f"127.0.0.1:{port}",
+        "--timeout", "120",
+        "--log-level", "warning",
+        target,
+    ]
+    return subprocess.Popen(
+        cmd, cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+ENDPOINTS = {"generate": "/generate", "stream": "/generate/stream"}
+
+
+def post(base_url, topic, endpoint="generate"):
+    body = json.dumps({"query": topic}).encode("utf-8")
+    req = urllib.request.Request(
+        f"{base_url}{ENDPOINTS[endpoint]}", data=body,
+        headers={"Content-Type": "application/json"}
+    )
+
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=120) as res:
+            data = res.read()
+        if endpoint == "stream":
+            # Son NDJSON satırı tam sonucu taşıyan "done" olayıdır
+            payload = json.loads(data.splitlines()[-1])["result"]
+        else:
+            payload = json.loads(data)
+        ok = bool(payload.get("questions"))
+    except Exception:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def probe_ping(base_url, stop, latencies, interval=0.25):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(f"{base_url}/ping", timeout=120) as res:
+                res.read()
+        except OSError:
+            pass
+        latencies.append(time.perf_counter() - started)
+        stop.wait(interval)
+
+
+def run_load(base_url, topics, concurrency, requests, endpoint="generate"):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    topic_cycle = itertools.cycle(topics)
+
+    def one(_):
+        nonlocal errors
+        with lock:
+            topic = next(topic_cycle)
+        elapsed, ok = post(base_url, topic, endpoint)
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    return latencies, errors, wall
+
+
+def read_call_log(path):
+    try:
+        data = Path(path).read_bytes()
+    except FileNotFoundError:
+        return 0, 0
+    return len(data), data.count(b"!")
+
+
+def bench_one(args, workers, worker_class, topics, port):
+    call_log = tempfile.NamedTemporaryFile(prefix="fake_calls_", delete=False).name
+
+    env = dict(os.environ)
+    env.update({
+        "FAKE_LATENCY": args.latency,
+        "FAKE_FAILURE_RATE": str(args.failure_rate),
+        "FAKE_CALL_LOG": call_log,
+        "PYTHONUNBUFFERED": "1",
+    })
+    if args.mix:
+        env["FAKE_MIX"] = args.mix
+
+    server = start_server(workers, worker_class, args.threads, port, env)
+    base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        if not wait_ready(base_url):
+            raise RuntimeError(f"gunicorn açılmadı: {worker_class} x{workers}")
+
+        # Isınma turu ölçüme katılmaz
+        run_load(base_url, topics, min(args.concurrency, 4), args.warmup, args.endpoint)
+        Path(call_log).write_bytes(b"")
+
+        stop = threading.Event()
+        pings = []
+        prober = threading.Thread(target=probe_ping, args=(base_url, stop, pings))
+        prober.start()
+        try:
+            latencies, errors, wall = run_load(
+                base_url, topics, args.concurrency, args.requests, args.endpoint
+            )
+        finally:
+            stop.set()
+            prober.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    calls, failures = read_call_log(call_log)
+    os.unlink(call_log)
+
+    result = summarize(latencies)
+    result.update({
+        "rps": round(len(latencies) / wall, 3),
+        "requests": len(latencies),
+        "errors": errors,
+        "upstream_calls": calls,
+        "upstream_failures": failures,
+        # İstek başına fazladan upstream çağrısı (retry + kısmi yeniden üretim)
+        "retry_rate": round(max(0, calls - len(latencies)) / max(1, len(latencies)), 4),
+        "ping_p95": summarize(pings)["p95"],
+    })
+    return result
+
+
+def read_topics(path):
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sahte Gemini ile yük testi")
+    parser.add_argument("--workers", default="1,4")
+    parser.add_argument(
+        "--worker-class", default="sync,gthread,uvicorn.workers.UvicornWorker"
+    )
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="generate")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--warmup", type=int, default=8)
+    parser.add_argument("--latency", default="lognormal:0.2:0.4")
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    parser.add_argument("--mix", default="")
+    parser.add_argument("--topics", default=str(ROOT / "topics.txt"))
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--out")
+    parser.add_argument("--baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    topics = read_topics(args.topics)
+    results = {}
+
+    for worker_class in args.worker_class.split(","):
+        for workers in (int(w) for w in args.workers.split(",")):
+            name = f"{worker_class} x{workers}"
+            print(f"▶ {name}")
+            result = bench_one(args, workers, worker_class, topics, args.port)
+            results[name] = result
+            print(
+                f"  p50={result['p50']:.3f}s p95={result['p95']:.3f}s "
+                f"p99={result['p99']:.3f}s rps={result['rps']:.2f} "
+                f"errors={result['errors']} retry_rate={result['retry_rate']:.2%} "
+                f"ping_p95={result['ping_p95']:.3f}s"
+            )
+
+    if args.out:
+        save_baseline(args.out, results)
+
+    if args.baseline and args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"BASELINE KAYDEDİLDİ → {args.baseline}")
+        return
+
+    if args.baseline:
+        baseline = load_baseline(args.baseline)
+        metrics = {"p50": False, "p95": False, "p99": False, "rps": True}
+        regressions = []
+        for name, result in results.items():
+            if name in baseline:
+                regressions += compare(name, result, baseline[name], metrics, args.tolerance)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
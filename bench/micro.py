@@ -0,0 +1,82 @@
+import argparse
+import os
+import sys
+import timeit
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from bench.fake_client import FIXTURES, load_responses
+from bench.stats import compare, load_baseline, save_baseline
+
+os.environ.setdefault("GEMINI_API_KEY", "fake")
+os.environ.setdefault("CACHE_ENABLED", "0")
+os.environ.setdefault("BANK_ENABLED", "0")
+os.environ.setdefault("BANK_REFILL", "0")
+os.environ.setdefault("REQUEST_LOG_ENABLED", "0")
+os.environ.setdefault("METRICS_SHARED", "0")
+os.environ.setdefault("RATE_LIMIT_RPM", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import app  # noqa: E402
+
+# ⏱ MİKRO BENCHMARK
+# Gerçekçi bozuk LLM çıktıları üzerinde safe_json_parse ve assess_response
+# sürelerini ölçer (µs/işlem) ve kayıtlı baseline ile karşılaştırır.
+#
+#   python -m bench.micro
+#   python -m bench.micro --baseline bench/baseline_micro.json [--save-baseline]
+
+TARGETS = {
+    "safe_json_parse": lambda text: app.safe_json_parse(text, "Tanzimat Fermanı"),
+    "assess_response": lambda text: app.assess_response(text, "Tanzimat Fermanı"),
+}
+
+
+def bench(fn, text, number, repeat):
+    # Parser'ın hata çıktıları ölçümü kirletmesin (LOG_LEVEL=WARNING)
+    with redirect_stdout(StringIO()):
+        timings = timeit.repeat(lambda: fn(text), number=number, repeat=repeat)
+    return min(timings) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="safe_json_parse mikro benchmark")
+    parser.add_argument("--corpus", default=str(FIXTURES / "responses.jsonl"))
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    corpus = load_responses(Path(args.corpus))
+    results = {}
+
+    for target, fn in TARGETS.items():
+        for kind, texts in corpus.items():
+            name = f"{target}[{kind}]"
+            with redirect_stdout(StringIO()):
+                parsed = fn(texts[0])
+            if isinstance(parsed, tuple):
+                parsed = parsed[1]
+            us = sum(bench(fn, text, args.number, args.repeat) for text in texts) / len(texts)
+            results[name] = {"us": round(us, 3), "ok": bool(parsed)}
+            print(f"{name:<40} {us:>10.2f} µs  ok={bool(parsed)}")
+
+    if args.baseline and args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"BASELINE KAYDEDİLDİ → {args.baseline}")
+        return
+
+    if args.baseline:
+        baseline = load_baseline(args.baseline)
+        regressions = []
+        for name, result in results.items():
+            if name in baseline:
+                regressions += compare(name, result, baseline[name], {"us": False}, args.tolerance)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import json
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def summarize(latencies):
+    return {
+        "p50": round(percentile(latencies, 50), 6),
+        "p95": round(percentile(latencies, 95), 6),
+        "p99": round(percentile(latencies, 99), 6),
+    }
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+# metric: {"higher_is_better": bool}; tolerance: izin verilen göreli sapma
+def compare(name, current, baseline, metrics, tolerance):
+    regressions = []
+
+    for metric, higher_is_better in metrics.items():
+        old = baseline.get(metric)
+        new = current.get(metric)
+        if not old or new is None:
+            continue
+
+        change = (new - old) / old
+        worse = change < -tolerance if higher_is_better else change > tolerance
+        mark = "REGRESSION" if worse else "ok"
+        print(f"  {name:<40} {metric:<8} {old:>12.4f} → {new:>12.4f} ({change:+.1%}) {mark}")
+
+        if worse:
+            regressions.append((name, metric))
+
+    return regressions
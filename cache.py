@@ -0,0 +1,246 @@
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+# Türkçe büyük/küçük harf dönüşümü: "İ" → "i", "I" → "ı"
+_TR_LOWER = str.maketrans({"İ": "i", "I": "ı"})
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_topic(text):
+    if not text:
+        return ""
+
+    text = unicodedata.normalize("NFC", str(text))
+    text = text.translate(_TR_LOWER).lower()
+    text = _NON_WORD.sub(" ", text)
+
+    return " ".join(text.split())
+
+
+# Normalize edilmiş konu → üretilmiş soru seti önbelleği.
+# Sıcak kayıtlar süreç içi LRU'da, tüm kayıtlar ise gunicorn worker'larının
+# paylaştığı ve yeniden başlatmalarda korunan SQLite dosyasında tutulur.
+class TopicCache:
+    def __init__(self, path, ttl=86400, max_entries=5000,
+                 memory_entries=256, variants=1):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.variants = max(1, variants)
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+
+        self._init_db()
+
+    # ---------- SQLite ----------
+
+    def _conn(self):
+        # gunicorn --preload: fork edilen worker üst sürecin bağlantısını kullanmaz
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._local = threading.local()
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT NOT NULL,
+                    variant INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (key, variant)
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_created ON results (created)"
+            )
+
+    def _load(self, key, now):
+        rows = self._conn().execute(
+            "SELECT variant, payload, created FROM results "
+            "WHERE key = ? AND created > ? ORDER BY variant",
+            (key, now - self.ttl)
+        ).fetchall()
+
+        if not rows:
+            return None
+
+        variants = [json.loads(payload) for _, payload, _ in rows]
+        expires = min(created for _, _, created in rows) + self.ttl
+        return expires, variants
+
+    def _store(self, key, result, now):
+        conn = self._conn()
+        with conn:
+            rows = conn.execute(
+                "SELECT variant, created FROM results WHERE key = ? "
+                "ORDER BY created",
+                (key,)
+            ).fetchall()
+
+            used = {variant for variant, _ in rows}
+            free = [v for v in range(self.variants) if v not in used]
+            # Boş slot yoksa en eski varyantın yerine yaz
+            variant = free[0] if free else rows[0][0]
+
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, variant, payload, created) "
+                "VALUES (?, ?, ?, ?)",
+                (key, variant, json.dumps(result, ensure_ascii=False), now)
+            )
+
+    def _evict_disk(self, now):
+        conn = self._conn()
+        with conn:
+            expired = conn.execute(
+                "DELETE FROM results WHERE created <= ?", (now - self.ttl,)
+            ).rowcount
+
+            overflow = conn.execute(
+                "DELETE FROM results WHERE rowid IN ("
+                "SELECT rowid FROM results ORDER BY created DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+
+        self.evictions += expired + overflow
+
+    # ---------- Bellek (LRU + TTL) ----------
+
+    def _remember(self, key, expires, variants):
+        with self._lock:
+            self._memory[key] = (expires, variants)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+                self.evictions += 1
+
+    def _recall(self, key, now):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry
+
+    # ---------- Genel API ----------
+
+    def get(self, topic):
+        key = normalize_topic(topic)
+        if not key:
+            return None
+
+        now = time.time()
+        entry = self._recall(key, now)
+        source = "memory"
+
+        # Bellekte eksik varyant varsa diğer worker'lar eklemiş olabilir
+        if entry is None or len(entry[1]) < self.variants:
+            entry = self._load(key, now)
+            source = "disk"
+            if entry is not None:
+                self._remember(key, *entry)
+
+        # Tüm varyant slotları dolmadan yeni içerik üretilsin
+        if entry is None or len(entry[1]) < self.variants:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if source == "memory":
+            self.memory_hits += 1
+        else:
+            self.disk_hits += 1
+
+        return random.choice(entry[1])
+
+    # Üretim başarısız/yavaşken süresi dolmuş ya da eksik varyantlı kayıtlar
+    # da kabul edilir (henüz diskten atılmamış olmaları yeterli)
+    def get_stale(self, topic):
+        key = normalize_topic(topic)
+        if not key:
+            return None
+
+        rows = self._conn().execute(
+            "SELECT payload FROM results WHERE key = ?", (key,)
+        ).fetchall()
+        if not rows:
+            return None
+
+        self.stale_hits += 1
+        return json.loads(random.choice(rows)[0])
+
+    def put(self, topic, result):
+        key = normalize_topic(topic)
+        if not key or not result or not result.get("questions"):
+            return
+
+        now = time.time()
+        self._store(key, result, now)
+        self._evict_disk(now)
+
+        entry = self._load(key, now)
+        if entry is not None:
+            self._remember(key, *entry)
+
+    def stats(self):
+        with self._lock:
+            memory_size = len(self._memory)
+
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "memory_size": memory_size,
+            "variants": self.variants,
+            "ttl": self.ttl,
+        }
+
+
+def cache_from_env():
+    if os.getenv("CACHE_ENABLED", "1") == "0":
+        return None
+
+    return TopicCache(
+        path=os.getenv("CACHE_PATH", "cache.sqlite3"),
+        ttl=int(os.getenv("CACHE_TTL", "86400")),
+        max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "5000")),
+        memory_entries=int(os.getenv("CACHE_MEMORY_ENTRIES", "256")),
+        variants=int(os.getenv("CACHE_VARIANTS", "1")),
+    )
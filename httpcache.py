@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import json
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 🗜 HTTP VERİMLİLİĞİ
+# Statik dosyalar açılışta bir kez gzip/brotli ile sıkıştırılıp ETag'lenir;
+# JSON yanıtlar istemcinin Accept-Encoding başlığına göre sıkıştırılır.
+
+MIN_COMPRESS_BYTES = 1024
+ETAG_SUFFIXES = ("-br", "-gzip")
+
+
+# Flask ve ASGI yolları aynı baytları üretir; ETag rotadan bağımsız kalır
+def json_body(data):
+    return json.dumps(
+        data, ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def content_etag(data):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def accepted_encoding(header):
+    accepted = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding, static=False):
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if static else 5)
+    return gzip.compress(data, compresslevel=9 if static else 6, mtime=0)
+
+
+# Yanıtın gönderileceği kodlama; küçük gövdeler sıkıştırılmaz
+def negotiate(body, header):
+    if len(body) < MIN_COMPRESS_BYTES:
+        return None
+    return accepted_encoding(header)
+
+
+# Her temsil kendi ETag'ini taşır; 200 ve 304 aynı etiketi gönderir
+def representation_etag(etag, encoding):
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def etag_matches(header, etag):
+    # Sıkıştırılmış temsillerin ETag'leri "-br"/"-gzip" ekiyle aynı içeriği gösterir
+    for candidate in (header or "").split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        candidate = candidate.removeprefix("W/").strip('"')
+        for suffix in ETAG_SUFFIXES:
+            candidate = candidate.removesuffix(suffix)
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified(etag, headers=None):
+    response = Response(status=304)
+    response.headers["ETag"] = f'"{etag}"'
+    response.headers["Vary"] = "Accept-Encoding"
+    for key, value in (headers or {}).items():
+        response.headers[key] = value
+    return response
+
+
+class StaticAsset:
+    def __init__(self, path, mimetype, max_age):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        self.mimetype = mimetype
+        self.etag = content_etag(data)
+        self.cache_control = f"public, max-age={max_age}"
+
+        self.variants = {None: data, "gzip": compress(data, "gzip", static=True)}
+        if brotli is not None:
+            self.variants["br"] = compress(data, "br", static=True)
+
+    def response(self, request):
+        headers = {"Cache-Control": self.cache_control}
+
+        encoding = accepted_encoding(request.headers.get("Accept-Encoding"))
+        if encoding not in self.variants:
+            encoding = None
+        etag = representation_etag(self.etag, encoding)
+
+        if etag_matches(request.headers.get("If-None-Match"), self.etag):
+            return not_modified(etag, headers)
+
+        response = Response(self.variants[encoding], mimetype=self.mimetype)
+        response.headers.update(headers)
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["ETag"] = f'"{etag}"'
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        # Sonradan sıkıştırılmasın
+        response.direct_passthrough = True
+        return response
+
+
+def compress_response(response, request):
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+        or response.mimetype != "application/json"
+    ):
+        return response
+
+    data = response.get_data()
+    encoding = negotiate(data, request.headers.get("Accept-Encoding"))
+    if len(data) >= MIN_COMPRESS_BYTES:
+        response.vary.add("Accept-Encoding")
+    if encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(representation_etag(etag, encoding), weak=weak)
+
+    return response
+
@@ -0,0 +1,399 @@
+import bisect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+log = logging.getLogger("kpss.metrics")
+
+# 📈 PROMETHEUS METRİKLERİ
+# Süreç içi sayaç ve histogramlar; /metrics metin formatında sunar.
+# gunicorn'da her worker değerlerini düzenli olarak paylaşılan SQLite
+# dosyasına yazar (MetricStore); scrape'i hangi worker karşılarsa karşılasın
+# tüm worker'ların toplamı döner.
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1, 2.5, 5, 10, 20, 30, 60,
+)
+
+_registry = []
+_collectors = []
+
+
+def _labels_text(pairs):
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            samples = [
+                [list(map(list, zip(self.labelnames, key))), value]
+                for key, value in sorted(self._values.items())
+            ]
+        return {"type": "counter", "help": self.help, "samples": samples}
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def collect(self):
+        with self._lock:
+            samples = [
+                [list(map(list, zip(self.labelnames, key))), [list(counts), total]]
+                for key, (counts, total) in sorted(self._values.items())
+            ]
+        return {
+            "type": "histogram", "help": self.help,
+            "buckets": list(self.buckets), "samples": samples,
+        }
+
+
+# fn() → [(isim, tip, açıklama, {etiket_tuple: değer} | değer), ...]
+def register_collector(fn):
+    _collectors.append(fn)
+
+
+# Bu sürecin tüm metrikleri: {isim: {"type", "help", "samples": [[etiketler, değer]]}}
+def collect():
+    families = {}
+    for metric in _registry:
+        families[metric.name] = metric.collect()
+
+    for collector in _collectors:
+        for name, kind, help, samples in collector():
+            if not isinstance(samples, dict):
+                samples = {(): samples}
+            families[name] = {
+                "type": kind,
+                "help": help,
+                "samples": [[list(map(list, labels)), value] for labels, value in samples.items()],
+            }
+
+    return families
+
+
+# snapshots: [(aileler, worker etiketi | None)]. Sayaç ve histogramlar tüm
+# worker'lar üzerinden toplanır; gauge'lar yalnızca canlı worker'lardan,
+# worker etiketiyle ayrı ayrı alınır.
+def merge(snapshots):
+    merged = {}
+    for families, worker in snapshots:
+        for name, family in families.items():
+            kind = family["type"]
+            if kind == "gauge" and worker is None:
+                continue
+
+            target = merged.setdefault(name, dict(family, samples={}))
+            for labels, value in family["samples"]:
+                if kind == "gauge":
+                    labels = labels + [["worker", worker]]
+                key = tuple(tuple(pair) for pair in labels)
+
+                if kind == "histogram":
+                    counts, total = target["samples"].get(key, ([0] * len(value[0]), 0.0))
+                    target["samples"][key] = (
+                        [a + b for a, b in zip(counts, value[0])], total + value[1]
+                    )
+                elif kind == "gauge":
+                    target["samples"][key] = value
+                else:
+                    target["samples"][key] = target["samples"].get(key, 0) + value
+
+    for family in merged.values():
+        family["samples"] = [
+            [list(map(list, key)), value] for key, value in sorted(family["samples"].items())
+        ]
+    return merged
+
+
+def format_text(families):
+    lines = []
+    for name, family in families.items():
+        kind = family["type"]
+        lines += [f"# HELP {name} {family['help']}", f"# TYPE {name} {kind}"]
+
+        for labels, value in family["samples"]:
+            labels = [tuple(pair) for pair in labels]
+            if kind != "histogram":
+                lines.append(f"{name}{_labels_text(labels)} {value}")
+                continue
+
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(family["buckets"] + ["+Inf"], counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels_text(labels + [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_labels_text(labels)} {total}")
+            lines.append(f"{name}_count{_labels_text(labels)} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+def render():
+    if _store is None:
+        return format_text(collect())
+
+    _store.start()
+    _store.publish(collect())
+    return format_text(_store.merged())
+
+
+# ---------- Worker'lar arası paylaşım ----------
+
+RETIRED = "retired"
+
+
+# Her worker kendi anlık görüntüsünü `interval` saniyede bir yazar. Uzun süre
+# (retire_after) güncellenmeyen, yani ölmüş worker'ların sayaçları "retired"
+# satırına eklenip silinir; böylece toplamlar yeniden başlatmalarda geri gitmez.
+class MetricStore:
+    def __init__(self, path, interval=5.0, retire_after=3600):
+        self.path = path
+        self.interval = interval
+        self.retire_after = retire_after
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = None
+        self.worker = None
+
+        self._init_db()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+
+    def start(self):
+        # gunicorn --preload ile fork edilen her worker kendi kimliğini alır
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._local = threading.local()
+            self.worker = f"{self._pid}-{uuid.uuid4().hex[:8]}"
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        pid = self._pid
+        while self._pid == pid:
+            time.sleep(self.interval)
+            try:
+                self.publish(collect())
+            except Exception as e:
+                log.warning("METRICS PUBLISH ERROR: %s", e)
+
+    def publish(self, families):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO workers (id, payload, updated) VALUES (?, ?, ?)",
+            (self.worker, json.dumps(families), time.time())
+        )
+
+    def _retire(self, conn, now):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            dead = conn.execute(
+                "SELECT id, payload FROM workers WHERE id != ? AND updated < ?",
+                (RETIRED, now - self.retire_after)
+            ).fetchall()
+            if dead:
+                row = conn.execute(
+                    "SELECT payload FROM workers WHERE id = ?", (RETIRED,)
+                ).fetchone()
+                snapshots = [(json.loads(row[0]), None)] if row else []
+                snapshots += [(json.loads(payload), None) for _, payload in dead]
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO workers (id, payload, updated) VALUES (?, ?, ?)",
+                    (RETIRED, json.dumps(merge(snapshots)), now)
+                )
+                conn.executemany(
+                    "DELETE FROM workers WHERE id = ?", [(worker,) for worker, _ in dead]
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def merged(self):
+        now = time.time()
+        conn = self._conn()
+        self._retire(conn, now)
+
+        snapshots = []
+        for worker, payload, updated in conn.execute(
+            "SELECT id, payload, updated FROM workers"
+        ):
+            live = worker != RETIRED and updated >= now - 3 * self.interval
+            snapshots.append((json.loads(payload), worker if live else None))
+        return merge(snapshots)
+
+
+_store = None
+
+
+def share(store):
+    global _store
+    _store = store
+    if store is not None:
+        store.start()
+
+
+def metric_store_from_env():
+    if os.getenv("METRICS_SHARED", "1") == "0":
+        return None
+
+    return MetricStore(
+        path=os.getenv("METRICS_PATH", "metrics.sqlite3"),
+        interval=float(os.getenv("METRICS_PUBLISH_INTERVAL", "5")),
+        retire_after=float(os.getenv("METRICS_RETIRE_AFTER", "3600")),
+    )
+
+
+REQUEST_SECONDS = Histogram(
+    "kpss_request_seconds", "Uçtan uca istek süresi", ["endpoint", "source"]
+)
+STAGE_SECONDS = Histogram(
+    "kpss_stage_seconds", "İstek aşamalarının süresi", ["stage"]
+)
+GEMINI_TOKENS = Counter(
+    "kpss_gemini_tokens_total", "Gemini yanıt metadatasındaki token kullanımı", ["kind"]
+)
+
+
+# ---------- İstek izi ----------
+
+_current = ContextVar("kpss_trace", default=None)
+
+
+class RequestTrace:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+        self.tokens = {}
+
+    def add_stage(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def add_tokens(self, kind, value):
+        self.tokens[kind] = self.tokens.get(kind, 0) + value
+
+
+def begin_request(endpoint):
+    if _store is not None:
+        _store.start()
+    trace = RequestTrace(endpoint)
+    _current.set(trace)
+    return trace
+
+
+def end_request(trace, source, **fields):
+    elapsed = time.perf_counter() - trace.started
+    REQUEST_SECONDS.observe(elapsed, endpoint=trace.endpoint, source=source)
+    _current.set(None)
+
+    record = {
+        "ts": round(time.time(), 3),
+        "endpoint": trace.endpoint,
+        "source": source,
+        "duration_ms": round(elapsed * 1000, 2),
+        "stages_ms": {k: round(v * 1000, 2) for k, v in trace.stages.items()},
+        "llm_attempts": trace.counts.get("llm_attempt", 0),
+        "tokens": trace.tokens,
+    }
+    record.update(fields)
+    return record
+
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        trace = _current.get()
+        if trace is not None:
+            trace.add_stage(name, elapsed)
+
+
+TOKEN_FIELDS = {
+    "prompt": "prompt_token_count",
+    "candidates": "candidates_token_count",
+    "thoughts": "thoughts_token_count",
+    "total": "total_token_count",
+}
+
+
+def record_usage(response):
+    meta = getattr(response, "usage_metadata", None)
+    if meta is None:
+        return
+
+    trace = _current.get()
+    for kind, attr in TOKEN_FIELDS.items():
+        value = getattr(meta, attr, None) or 0
+        if not value:
+            continue
+        GEMINI_TOKENS.inc(value, kind=kind)
+        if trace is not None:
+            trace.add_tokens(kind, value)
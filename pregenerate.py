@@ -0,0 +1,91 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# app'in sunucu tarafı arka plan işleri CLI'da çalışmasın: BankRefiller
+# --concurrency'yi yok sayıp --bank yerine BANK_PATH'e yazardı
+os.environ["BANK_ENABLED"] = "0"
+os.environ["BANK_REFILL"] = "0"
+os.environ["REQUEST_LOG_ENABLED"] = "0"
+os.environ["METRICS_SHARED"] = "0"
+
+from app import generate_content_from_query, validate_result  # noqa: E402
+from bank import QuestionBank  # noqa: E402
+
+# 🏦 SORU BANKASI ÖN ÜRETİMİ
+# Konu listesindeki her konu için N adet doğrulanmış soru seti üretir ve
+# bank.sqlite3 dosyasına yazar. Eşzamanlılık --concurrency ile sınırlanır.
+#
+#   python pregenerate.py topics.txt --per-topic 10 --concurrency 4
+
+
+def read_topics(path):
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def generate_one(topic, attempts):
+    for _ in range(attempts):
+        result = generate_content_from_query(topic)
+        if validate_result(result):
+            return result
+        print("REJECTED:", topic)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KPSS soru bankası üretici")
+    parser.add_argument("topics", nargs="?", default="topics.txt")
+    parser.add_argument("--per-topic", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--attempts", type=int, default=2)
+    parser.add_argument("--bank", default=os.getenv("BANK_PATH", "bank.sqlite3"))
+    parser.add_argument(
+        "--top-up", action="store_true",
+        help="yalnızca --per-topic sayısına ulaşmayan konuları tamamla"
+    )
+    args = parser.parse_args()
+
+    bank = QuestionBank(args.bank)
+    jobs = []
+
+    for topic in read_topics(args.topics):
+        key = bank.add_topic(topic)
+        missing = args.per_topic
+        if args.top_up:
+            missing -= bank.available(key)
+        jobs += [topic] * max(0, missing)
+
+    print(f"{len(jobs)} SET ÜRETİLECEK")
+    started = time.time()
+    done = failed = 0
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = {
+            pool.submit(generate_one, topic, args.attempts): topic
+            for topic in jobs
+        }
+
+        for future in as_completed(futures):
+            topic = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print("BACKEND ERROR:", topic, str(e))
+                result = None
+
+            if result is None:
+                failed += 1
+                continue
+
+            bank.add(topic, result)
+            done += 1
+            print(f"[{done + failed}/{len(jobs)}] {topic}")
+
+    print(f"BİTTİ → {done} set, {failed} hata, {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger("kpss.ratelimit")
+
+
+class RateLimitTimeout(Exception):
+    pass
+
+
+# 🪣 TOKEN BUCKET
+# Durum SQLite'ta tutulur, böylece tüm gunicorn worker'ları aynı kovayı
+# paylaşır. Her çağrı bir token rezerve eder; kova boşsa bakiye eksiye düşer
+# ve çağıran, sırası gelene kadar bekler (hata yerine kuyruk).
+class TokenBucket:
+    def __init__(self, path, rate, capacity, max_wait=60):
+        self.path = path
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = max_wait
+
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+
+        self._init_db()
+
+    def _conn(self):
+        # gunicorn --preload: fork edilen worker üst sürecin bağlantısını kullanmaz
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._local = threading.local()
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        conn.execute(
+            "INSERT OR IGNORE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+            ("gemini", self.capacity, time.time())
+        )
+
+    def reserve(self, cost=1, max_wait=None):
+        max_wait = self.max_wait if max_wait is None else max_wait
+        conn = self._conn()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, updated = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE name = 'gemini'"
+            ).fetchone()
+
+            now = time.time()
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            wait = max(0.0, (cost - tokens) / self.rate)
+
+            if wait > max_wait:
+                conn.execute("ROLLBACK")
+                self.timeouts += 1
+                raise RateLimitTimeout(f"rate limit kuyruğu {wait:.1f}s")
+
+            conn.execute(
+                "UPDATE buckets SET tokens = ?, updated = ? WHERE name = 'gemini'",
+                (tokens - cost, now)
+            )
+            conn.execute("COMMIT")
+        except RateLimitTimeout:
+            raise
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self.acquired += 1
+        if wait > 0:
+            self.waited += 1
+            self.wait_seconds += wait
+        return wait
+
+    def acquire(self, cost=1, max_wait=None):
+        wait = self.reserve(cost, max_wait)
+        if wait > 0:
+            log.debug("RATE LIMIT WAIT %.2fs", wait)
+            time.sleep(wait)
+
+    async def acquire_async(self, cost=1, max_wait=None):
+        wait = await asyncio.to_thread(self.reserve, cost, max_wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def stats(self):
+        return {
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "timeouts": self.timeouts,
+        }
+
+
+def limiter_from_env():
+    rpm = float(os.getenv("RATE_LIMIT_RPM", "1000"))
+    if rpm <= 0:
+        return None
+
+    return TokenBucket(
+        path=os.getenv("RATE_LIMIT_PATH", "ratelimit.sqlite3"),
+        rate=rpm / 60,
+        capacity=float(os.getenv("RATE_LIMIT_BURST", "20")),
+        max_wait=float(os.getenv("RATE_LIMIT_MAX_WAIT", "60")),
+    )
@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+log = logging.getLogger("kpss.reqlog")
+
+# 📝 İSTEK GÜNLÜĞÜ
+# Kayıtlar kuyruğa atılır (istek yolunu bloklamaz), arka plan thread'i
+# toplu halde JSONL dosyasına yazar ve boyut sınırında dosyayı döndürür.
+
+
+class RequestLog:
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=5,
+                 flush_interval=1.0, batch_size=256, queue_size=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # Disk yetişemiyorsa istek beklemesin, kayıt düşsün
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self._flush(batch)
+                except Exception as e:
+                    log.warning("REQUEST LOG ERROR: %s", e)
+
+    def _flush(self, batch):
+        data = "".join(
+            json.dumps(record, ensure_ascii=False, default=str) + "\n"
+            for record in batch
+        ).encode("utf-8")
+
+        self._rotate_if_needed(len(data))
+
+        # O_APPEND: birden fazla worker aynı dosyaya güvenle ekler
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+        self.written += len(batch)
+
+    def _rotate_if_needed(self, incoming):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+
+        if size + incoming <= self.max_bytes:
+            return
+
+        try:
+            for i in range(self.backups - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+
+            if self.backups > 0:
+                os.replace(self.path, f"{self.path}.1")
+            else:
+                os.remove(self.path)
+        except FileNotFoundError:
+            # Başka bir worker aynı anda döndürmüş
+            pass
+
+
+def request_log_from_env():
+    if os.getenv("REQUEST_LOG_ENABLED", "1") == "0":
+        return None
+
+    return RequestLog(
+        path=os.getenv("REQUEST_LOG_PATH", "requests.jsonl"),
+        max_bytes=int(os.getenv("REQUEST_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        backups=int(os.getenv("REQUEST_LOG_BACKUPS", "5")),
+        flush_interval=float(os.getenv("REQUEST_LOG_FLUSH_INTERVAL", "1.0")),
+    )
@@ -0,0 +1,353 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+log = logging.getLogger("kpss.resilience")
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+# ---------- Uçtan uca süre sınırı ----------
+
+_deadline = ContextVar("kpss_deadline", default=None)
+
+
+# İç içe kapsamlarda dıştaki (daha erken) sınır geçerli kalır
+@contextmanager
+def deadline_scope(seconds):
+    deadline = _deadline.get()
+    if seconds:
+        own = time.monotonic() + seconds
+        deadline = own if deadline is None else min(deadline, own)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline():
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("istek süresi doldu")
+    return left
+
+
+# ---------- Gecikme takibi ----------
+
+class LatencyTracker:
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p, min_samples=20):
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+# ---------- Devre kesici ----------
+
+# Birincil modelin hata oranı veya p95 gecikmesi eşiği aşınca devre açılır ve
+# çağrılar soğuma süresi boyunca yedek modele gider. Süre bitince tek bir
+# deneme (half-open) birincil modele gönderilir. Sonucu hiç bildirilmeyen
+# deneme `latency` süresini aşınca başarısız sayılır; devre askıda kalmaz.
+class CircuitBreaker:
+    def __init__(self, window=20, min_calls=10, error_rate=0.5,
+                 latency=20.0, cooldown=30.0):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.latency = latency
+        self.cooldown = cooldown
+
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self.opened = 0
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "closed":
+                return True
+            if self.state == "open" and now - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+            if self.state == "half_open" and self._probing and now - self._probe_started >= self.latency:
+                self._probing = False
+                self._open()
+                return False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                self._probe_started = now
+                return True
+            return False
+
+    # ok=None: çağrı sonuçlanmadan bırakıldı (istemci koptu, hedge kazandı)
+    def record(self, ok, seconds):
+        with self._lock:
+            if ok is None:
+                if self.state == "half_open" and self._probing:
+                    self._probing = False
+                return
+
+            if self.state == "half_open" and self._probing:
+                self._probing = False
+                if ok and seconds < self.latency:
+                    self.state = "closed"
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append((ok, seconds))
+            if self.state == "closed" and self._tripped():
+                self._open()
+
+    def _tripped(self):
+        if len(self._outcomes) < self.min_calls:
+            return False
+
+        failures = sum(1 for ok, _ in self._outcomes if not ok)
+        latencies = sorted(seconds for _, seconds in self._outcomes)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+        return failures / len(self._outcomes) >= self.error_rate or p95 >= self.latency
+
+    def _open(self):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        log.warning("CIRCUIT OPEN → yedek modele geçiliyor")
+
+
+# ---------- Hedge'li, süre sınırlı çağrı ----------
+
+class ResilientCaller:
+    def __init__(self, primary, fallback=None, breaker=None, hedge=True,
+                 hedge_percentile=95, hedge_delay=8.0, max_workers=32):
+        self.primary = primary
+        self.fallback = fallback
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.latency = {primary: LatencyTracker()}
+        if fallback:
+            self.latency[fallback] = LatencyTracker()
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self.deadline_exceeded = 0
+
+    def degraded(self):
+        return self.breaker.state != "closed"
+
+    def route(self):
+        # allow() yedek model olmasa da çağrılır: open → half_open geçişi
+        # ve deneme isteği breaker'ın durumunu ilerletir
+        allowed = self.breaker.allow()
+        if allowed or self.fallback is None:
+            return self.primary
+        with self._lock:
+            self.fallbacks += 1
+        return self.fallback
+
+    def hedge_after(self, model):
+        learned = self.latency[model].percentile(self.hedge_percentile)
+        return learned if learned is not None else self.hedge_delay
+
+    # ok: True/False ya da sonuçlanmadan bırakılan çağrı için None
+    def observe(self, model, ok, seconds):
+        if ok:
+            self.latency[model].add(seconds)
+        if model == self.primary:
+            self.breaker.record(ok, seconds)
+
+    def _timed(self, fn, model, timeout):
+        started = time.monotonic()
+        try:
+            result = fn(model, timeout)
+        except Exception:
+            self.observe(model, False, time.monotonic() - started)
+            raise
+        self.observe(model, True, time.monotonic() - started)
+        return result
+
+    def _expired(self):
+        with self._lock:
+            self.deadline_exceeded += 1
+        return DeadlineExceeded("LLM çağrısı süre sınırını aştı")
+
+    # fn(model, timeout_saniye) → yanıt; can_hedge() ikinci çağrı için kota onayı
+    def call(self, fn, can_hedge=lambda: True):
+        timeout = check_deadline()
+        model = self.route()
+
+        futures = {self._pool.submit(self._timed, fn, model, timeout): "primary"}
+        hedge_at = self.hedge_after(model) if self.hedge else None
+        error = None
+
+        while futures:
+            left = remaining()
+            if left is not None and left <= 0:
+                raise self._expired()
+
+            wait_for = left
+            if hedge_at is not None:
+                wait_for = hedge_at if left is None else min(hedge_at, left)
+
+            done, _ = wait(futures, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                kind = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if kind == "hedge":
+                    with self._lock:
+                        self.hedge_wins += 1
+                return result
+
+            if done or hedge_at is None:
+                continue
+
+            # Birincil çağrı öğrenilen yüzdelik dilimi aştı → ikinci istek
+            left = remaining()
+            if (left is None or left > 0) and can_hedge():
+                with self._lock:
+                    self.hedges += 1
+                log.info("HEDGE → %s", model)
+                futures[self._pool.submit(self._timed, fn, model, left)] = "hedge"
+            hedge_at = None
+
+        raise error
+
+    async def call_async(self, fn, can_hedge=lambda: True):
+        timeout = check_deadline()
+        model = self.route()
+
+        async def timed(timeout):
+            started = time.monotonic()
+            try:
+                result = await fn(model, timeout)
+            except Exception:
+                self.observe(model, False, time.monotonic() - started)
+                raise
+            self.observe(model, True, time.monotonic() - started)
+            return result
+
+        tasks = {asyncio.ensure_future(timed(timeout)): "primary"}
+        started = {task: time.monotonic() for task in tasks}
+        hedge_at = self.hedge_after(model) if self.hedge else None
+        error = None
+        won = False
+
+        try:
+            while tasks:
+                left = remaining()
+                if left is not None and left <= 0:
+                    raise self._expired()
+
+                wait_for = left
+                if hedge_at is not None:
+                    wait_for = hedge_at if left is None else min(hedge_at, left)
+
+                done, _ = await asyncio.wait(
+                    tasks, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    kind = tasks.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if kind == "hedge":
+                        with self._lock:
+                            self.hedge_wins += 1
+                    won = True
+                    return task.result()
+
+                if done or hedge_at is None:
+                    continue
+
+                # Kota kontrolü SQLite'a yazar; event loop'u bloklamasın
+                left = remaining()
+                if (left is None or left > 0) and await asyncio.to_thread(can_hedge):
+                    with self._lock:
+                        self.hedges += 1
+                    log.info("HEDGE → %s (async)", model)
+                    task = asyncio.ensure_future(timed(left))
+                    tasks[task] = "hedge"
+                    started[task] = time.monotonic()
+                hedge_at = None
+
+            raise error
+        finally:
+            # Kaybeden istek iptal edilir. CancelledError timed() içinde
+            # yakalanmadığından sonuç burada kaydedilir: süre dolduysa hata,
+            # diğer istek kazandıysa yalnızca bırakıldı (half-open askıda kalmaz)
+            for task in tasks:
+                if task.done():
+                    continue
+                task.cancel()
+                self.observe(model, None if won else False, time.monotonic() - started[task])
+
+    def stats(self):
+        return {
+            "primary": self.primary,
+            "fallback": self.fallback,
+            "breaker_state": self.breaker.state,
+            "breaker_opened": self.breaker.opened,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "fallbacks": self.fallbacks,
+            "deadline_exceeded": self.deadline_exceeded,
+            "hedge_after": round(self.hedge_after(self.primary), 3),
+        }
+
+
+def caller_from_env():
+    return ResilientCaller(
+        primary=os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+        fallback=os.getenv("GEMINI_FALLBACK_MODEL", "gemini-2.5-flash-lite") or None,
+        breaker=CircuitBreaker(
+            window=int(os.getenv("BREAKER_WINDOW", "20")),
+            min_calls=int(os.getenv("BREAKER_MIN_CALLS", "10")),
+            error_rate=float(os.getenv("BREAKER_ERROR_RATE", "0.5")),
+            latency=float(os.getenv("BREAKER_LATENCY", "20")),
+            cooldown=float(os.getenv("BREAKER_COOLDOWN", "30")),
+        ),
+        hedge=os.getenv("HEDGE_ENABLED", "1") == "1",
+        hedge_percentile=float(os.getenv("HEDGE_PERCENTILE", "95")),
+        hedge_delay=float(os.getenv("HEDGE_DELAY", "8")),
+        max_workers=int(os.getenv("LLM_POOL_SIZE", "32")),
+    )
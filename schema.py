@@ -0,0 +1,33 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+# Gemini structured output şeması (response_schema olarak gönderilir)
+
+# Her set tam olarak bu kadar soru taşır; şema da modele bunu bildirir
+QUESTION_COUNT = 5
+
+
+class Choices(BaseModel):
+    A: str
+    B: str
+    C: str
+    D: str
+
+
+class Question(BaseModel):
+    question: str
+    choices: Choices
+    answer: Literal["A", "B", "C", "D"]
+    explanation: str
+
+
+class QuizResult(BaseModel):
+    topic: str
+    story: str
+    questions: list[Question] = Field(min_length=QUESTION_COUNT, max_length=QUESTION_COUNT)
+
+
+# Kısmi yeniden üretimde yalnızca eksik sorular istenir
+class QuestionList(BaseModel):
+    questions: list[Question]
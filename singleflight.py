@@ -0,0 +1,119 @@
+import asyncio
+
+
+# Aynı anahtar için eşzamanlı gelen istekleri tek bir upstream çağrısında
+# birleştirir; ilk gelen çağrıyı başlatır, diğerleri aynı sonucu bekler.
+class AsyncSingleFlight:
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key, fn):
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            # Bekleyen bir istemcinin iptali ortak çağrıyı iptal etmesin
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        future = asyncio.ensure_future(fn())
+        self._inflight[key] = future
+
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._inflight.pop(key, None)
+            else:
+                future.add_done_callback(
+                    lambda _: self._inflight.pop(key, None)
+                )
+
+    def inflight(self, key):
+        return key in self._inflight
+
+    def stats(self):
+        return {
+            "inflight": len(self._inflight),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
+
+
+class _StreamFlight:
+    def __init__(self):
+        self.events = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Condition()
+
+    async def run(self, stream):
+        try:
+            async for event in stream:
+                async with self.changed:
+                    self.events.append(event)
+                    self.changed.notify_all()
+        except BaseException as e:
+            self.error = e
+            raise
+        finally:
+            async with self.changed:
+                self.done = True
+                self.changed.notify_all()
+
+    async def follow(self):
+        # Geç katılan abone önce kaçırdığı olayları, sonra canlı akışı alır
+        index = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: index < len(self.events) or self.done)
+                batch = self.events[index:]
+                finished = self.done
+
+            index += len(batch)
+            for event in batch:
+                yield event
+
+            if finished and index == len(self.events):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+# Akan yanıtlar için aynı fikir: bir konu için tek upstream akışı açılır,
+# olaylar o konuyu bekleyen tüm istemcilere dağıtılır. Akış istemcilerden
+# bağımsız bir görevde sürer; bir istemcinin kopması diğerlerini etkilemez.
+class AsyncStreamFlight:
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def subscribe(self, key, fn):
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.shared += 1
+        else:
+            self.calls += 1
+            flight = _StreamFlight()
+            self._inflight[key] = flight
+            task = asyncio.ensure_future(flight.run(fn()))
+            task.add_done_callback(lambda _: self._release(key, flight))
+
+        async for event in flight.follow():
+            yield event
+
+    def _release(self, key, flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def inflight(self, key):
+        return key in self._inflight
+
+    def stats(self):
+        return {
+            "inflight": len(self._inflight),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
@@ -0,0 +1,101 @@
+import json
+
+
+# Gemini akışından gelen parçaları karakter karakter tarar; "topic" ve
+# "story" değerlerini, "questions" dizisinin her elemanını ise kapanır
+# kapanmaz olay olarak döndürür. Tam JSON'un bitmesini beklemez.
+class StreamingResultParser:
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+
+        self.stack = []
+        self.keys = []
+        self.expect_key = []
+
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.question_start = None
+
+    def feed(self, chunk):
+        events = []
+        if not chunk:
+            return events
+
+        self.buffer += chunk
+
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    self._close_string(events)
+
+            elif not self.stack:
+                # Kök nesneden önceki ```json vb. gürültüyü atla
+                if ch == "{":
+                    self._open("{")
+
+            elif ch == '"':
+                self.in_string = True
+                self.string_start = self.pos
+
+            elif ch in "{[":
+                if ch == "{" and self._in_questions():
+                    self.question_start = self.pos
+                self._open(ch)
+
+            elif ch in "}]":
+                self._close()
+                if ch == "}" and self._in_questions() and self.question_start is not None:
+                    raw = self.buffer[self.question_start:self.pos + 1]
+                    self.question_start = None
+                    events.append(("question", raw))
+
+            elif ch == ":":
+                if self.stack[-1] == "{":
+                    self.expect_key[-1] = False
+
+            elif ch == ",":
+                if self.stack[-1] == "{":
+                    self.expect_key[-1] = True
+
+            self.pos += 1
+
+        return events
+
+    def _open(self, kind):
+        self.stack.append(kind)
+        self.keys.append(None)
+        self.expect_key.append(kind == "{")
+
+    def _close(self):
+        if self.stack:
+            self.stack.pop()
+            self.keys.pop()
+            self.expect_key.pop()
+
+    def _in_questions(self):
+        return self.stack == ["{", "["] and self.keys[0] == "questions"
+
+    def _close_string(self, events):
+        raw = self.buffer[self.string_start:self.pos + 1]
+
+        if self.stack[-1] == "{" and self.expect_key[-1]:
+            try:
+                self.keys[-1] = json.loads(raw, strict=False)
+            except ValueError:
+                self.keys[-1] = None
+            return
+
+        if len(self.stack) == 1 and self.keys[0] in ("topic", "story"):
+            try:
+                events.append((self.keys[0], json.loads(raw, strict=False)))
+            except ValueError:
+                pass
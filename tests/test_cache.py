@@ -0,0 +1,25 @@
+import pytest
+
+from cache import normalize_topic
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Lale Devri", "lale devri"),
+    ("  Lale   Devri!! ", "lale devri"),
+    ("İSTANBUL'un Fethi", "istanbul un fethi"),
+    ("IŞIK ve ılık", "ışık ve ılık"),
+    ("Çanakkale Savaşı (1915)", "çanakkale savaşı 1915"),
+    ("tanzimat_fermanı", "tanzimat fermanı"),
+])
+def test_normalize_topic(text, expected):
+    assert normalize_topic(text) == expected
+
+
+def test_normalize_topic_unifies_unicode_forms():
+    # Ayrışık "C" + çengel, birleşik "Ç" ile aynı anahtarı vermeli
+    assert normalize_topic("C\u0327anakkale") == normalize_topic("Çanakkale")
+
+
+@pytest.mark.parametrize("text", [None, "", "  ", "!?"])
+def test_normalize_topic_empty(text):
+    assert normalize_topic(text) == ""
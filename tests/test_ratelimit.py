@@ -0,0 +1,52 @@
+import pytest
+
+from ratelimit import RateLimitTimeout, TokenBucket
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    return TokenBucket(str(tmp_path / "ratelimit.sqlite3"), rate=10, capacity=2)
+
+
+def test_reserve_spends_burst_without_waiting(bucket):
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.acquired == 2
+    assert bucket.waited == 0
+
+
+def test_reserve_returns_wait_once_empty(bucket):
+    bucket.reserve(cost=2)
+
+    wait = bucket.reserve()
+
+    assert wait == pytest.approx(0.1, abs=0.02)
+    assert bucket.waited == 1
+    assert bucket.wait_seconds == pytest.approx(wait)
+
+
+def test_reserve_queues_behind_earlier_reservations(bucket):
+    bucket.reserve(cost=2)
+    first = bucket.reserve()
+    second = bucket.reserve()
+
+    assert second == pytest.approx(first + 0.1, abs=0.02)
+
+
+def test_reserve_times_out_without_spending_tokens(bucket):
+    bucket.reserve(cost=2)
+
+    with pytest.raises(RateLimitTimeout):
+        bucket.reserve(max_wait=0.05)
+
+    assert bucket.timeouts == 1
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+
+
+def test_buckets_share_state_through_the_file(tmp_path):
+    path = str(tmp_path / "ratelimit.sqlite3")
+    first = TokenBucket(path, rate=10, capacity=1)
+    second = TokenBucket(path, rate=10, capacity=1)
+
+    assert first.reserve() == 0
+    assert second.reserve() == pytest.approx(0.1, abs=0.02)
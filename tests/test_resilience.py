@@ -0,0 +1,107 @@
+import time
+
+from resilience import CircuitBreaker, ResilientCaller
+
+
+def tripped_breaker(**kwargs):
+    breaker = CircuitBreaker(window=4, min_calls=4, latency=1.0, **kwargs)
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    return breaker
+
+
+def test_breaker_opens_on_error_rate():
+    breaker = tripped_breaker(cooldown=60)
+
+    assert breaker.state == "open"
+    assert breaker.opened == 1
+    assert breaker.allow() is False
+
+
+def test_breaker_opens_on_slow_calls():
+    breaker = CircuitBreaker(window=4, min_calls=4, latency=1.0, cooldown=60)
+    for _ in range(4):
+        breaker.record(True, 2.0)
+
+    assert breaker.state == "open"
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = tripped_breaker(cooldown=0)
+
+    assert breaker.allow() is True
+    assert breaker.state == "half_open"
+    assert breaker.allow() is False
+
+    breaker.record(True, 0.1)
+    assert breaker.state == "closed"
+    assert breaker.allow() is True
+
+
+def test_failed_probe_reopens():
+    breaker = tripped_breaker(cooldown=0)
+
+    assert breaker.allow() is True
+    breaker.record(False, 0.1)
+
+    assert breaker.state == "open"
+    assert breaker.opened == 2
+
+
+def test_abandoned_probe_is_released():
+    breaker = tripped_breaker(cooldown=0)
+
+    assert breaker.allow() is True
+    breaker.record(None, 0.1)
+
+    assert breaker.state == "half_open"
+    assert breaker.allow() is True
+
+
+def test_stuck_probe_expires():
+    breaker = tripped_breaker(cooldown=0)
+    breaker.latency = 0.05
+
+    assert breaker.allow() is True
+    time.sleep(0.06)
+
+    assert breaker.allow() is False
+    assert breaker.state == "open"
+
+
+def test_route_uses_fallback_while_open():
+    caller = ResilientCaller("primary", "fallback", breaker=tripped_breaker(cooldown=60))
+
+    assert caller.route() == "fallback"
+    assert caller.fallbacks == 1
+
+
+def test_route_probes_primary_after_cooldown():
+    caller = ResilientCaller("primary", "fallback", breaker=tripped_breaker(cooldown=0))
+
+    assert caller.route() == "primary"
+    assert caller.route() == "fallback"
+
+    caller.observe("primary", True, 0.1)
+    assert caller.breaker.state == "closed"
+    assert not caller.degraded()
+
+
+def test_route_without_fallback_still_recovers():
+    # GEMINI_FALLBACK_MODEL="" iken de breaker open'dan çıkabilmeli
+    caller = ResilientCaller("primary", None, breaker=tripped_breaker(cooldown=0))
+
+    assert caller.route() == "primary"
+    assert caller.breaker.state == "half_open"
+
+    caller.observe("primary", True, 0.1)
+    assert caller.breaker.state == "closed"
+    assert caller.fallbacks == 0
+
+
+def test_route_without_fallback_sends_to_primary_while_open():
+    caller = ResilientCaller("primary", None, breaker=tripped_breaker(cooldown=60))
+
+    assert caller.route() == "primary"
+    assert caller.breaker.state == "open"
+    assert caller.fallbacks == 0
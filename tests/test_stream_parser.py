@@ -0,0 +1,61 @@
+import json
+
+from stream_parser import StreamingResultParser
+
+QUESTION = {
+    "question": "Lale Devri hangi padişah döneminde yaşanmıştır?",
+    "choices": {"A": "III. Ahmed", "B": "II. Mahmud", "C": "I. Mahmud", "D": "III. Selim"},
+    "answer": "A",
+    "explanation": "Lale Devri, III. Ahmed döneminde (1718-1730) yaşanmıştır."
+}
+
+
+def feed_all(text, size):
+    parser = StreamingResultParser()
+    events = []
+    for i in range(0, len(text), size):
+        events += parser.feed(text[i:i + size])
+    return events
+
+
+def test_events_do_not_depend_on_chunking():
+    text = json.dumps({"topic": "Lale Devri", "story": "Hikâye", "questions": [QUESTION] * 2}, ensure_ascii=False)
+
+    expected = feed_all(text, len(text))
+    assert [kind for kind, _ in expected] == ["topic", "story", "question", "question"]
+    for size in (1, 3, 64):
+        assert feed_all(text, size) == expected
+
+
+def test_questions_are_complete_json():
+    text = json.dumps({"topic": "Lale Devri", "story": "Hikâye", "questions": [QUESTION]})
+
+    events = feed_all(text, 5)
+
+    assert ("topic", "Lale Devri") in events
+    assert json.loads(events[-1][1]) == QUESTION
+
+
+def test_skips_fence_and_ignores_brackets_in_strings():
+    story = 'Sadrazam "Nevşehirli" {İbrahim} [Paşa]'
+    question = dict(QUESTION, explanation='"}" ve "]" karakterleri')
+    text = "```json\n" + json.dumps({"story": story, "questions": [question]}) + "\n```"
+
+    events = feed_all(text, 7)
+
+    assert events[0] == ("story", story)
+    assert json.loads(events[1][1]) == question
+
+
+def test_incomplete_question_is_not_emitted():
+    text = json.dumps({"story": "Hikâye", "questions": [QUESTION]})
+
+    events = feed_all(text[:-5], 4)
+
+    assert events == [("story", "Hikâye")]
+
+
+def test_nested_values_are_not_top_level_events():
+    text = json.dumps({"meta": {"topic": "iç", "story": "iç"}, "topic": "dış"})
+
+    assert feed_all(text, 2) == [("topic", "dış")]